@@ -0,0 +1,187 @@
+import os
+import json
+import bisect
+import argparse
+import logging
+import threading
+from datetime import datetime
+import requests
+from amazon_config import ALERT_RULES_FILE, ALERTS_LOG, ALERT_STATE_FILE, ALERT_WEBHOOK, BASE_URL, MARKETPLACES
+
+log = logging.getLogger(__name__)
+
+
+class AlertRule:
+    # Fires for an ASIN or any product of a search term when the price is at or below max_price,
+    # or at least drop_pct percent below the lowest price in the history. seller narrows it down.
+    # A rule watches one store (base_url), whose currency max_price is in.
+    def __init__(self, user, asin=None, search_term=None, max_price=None, drop_pct=None, seller=None, rule_id=None,
+                 base_url=BASE_URL):
+        if not asin and not search_term:
+            raise ValueError("An alert rule needs an asin or a search_term")
+        if max_price is None and drop_pct is None:
+            raise ValueError("An alert rule needs max_price or drop_pct")
+        self.user = user
+        self.asin = asin
+        self.search_term = search_term
+        self.max_price = float(max_price) if max_price is not None else None
+        self.drop_pct = float(drop_pct) if drop_pct is not None else None
+        self.seller = seller
+        self.rule_id = rule_id
+        self.base_url = base_url
+
+    def to_dict(self):
+        return {key: value for key, value in vars(self).items() if value is not None}
+
+    def matches_seller(self, product):
+        return not self.seller or self.seller.lower() in (product.get('seller') or '').lower()
+
+
+class FileSink:
+    def __init__(self, path=ALERTS_LOG):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def send(self, alert):
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(alert) + '\n')
+
+
+class WebhookSink:
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alert):
+        try:
+            requests.post(self.url, json=alert, timeout=self.timeout).raise_for_status()
+        except Exception as e:
+            log.warning("Alert webhook failed: %s", e)
+
+
+def get_default_sinks():
+    sinks = [FileSink()]
+    if ALERT_WEBHOOK:
+        sinks.append(WebhookSink(ALERT_WEBHOOK))
+    return sinks
+
+
+class ThresholdIndex:
+    # Price rules of one ASIN or search term, sorted by max_price. A price matches every rule from
+    # the first threshold >= price onwards, found with one bisect instead of a scan over all rules.
+    def __init__(self):
+        self.thresholds = []
+        self.rules = []
+
+    def add(self, rule):
+        position = bisect.bisect_right(self.thresholds, rule.max_price)
+        self.thresholds.insert(position, rule.max_price)
+        self.rules.insert(position, rule)
+
+    def match(self, price):
+        return self.rules[bisect.bisect_left(self.thresholds, price):]
+
+
+class AlertEngine:
+    def __init__(self, path=ALERT_RULES_FILE, history=None, sinks=None, state_path=ALERT_STATE_FILE):
+        self.path = path
+        self.state_path = state_path
+        self.history = history
+        self.sinks = get_default_sinks() if sinks is None else sinks
+        self.rules = []
+        self.price_index = {}
+        self.drop_rules = {}
+        self.next_id = 1
+        # rule_id -> {asin: last notified price}, so a rule only fires again for a lower price, across runs too
+        self.notified = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for entry in json.load(f):
+                    self.index(AlertRule(**entry))
+        if state_path and os.path.exists(state_path):
+            with open(state_path) as f:
+                self.notified = {int(rule_id): prices for rule_id, prices in json.load(f).items()}
+
+    def index(self, rule):
+        if rule.rule_id is None:
+            rule.rule_id = self.next_id
+        self.next_id = max(self.next_id, rule.rule_id + 1)
+        self.rules.append(rule)
+        key = ('asin', rule.base_url, rule.asin) if rule.asin else ('search', rule.base_url, rule.search_term)
+        if rule.max_price is not None:
+            self.price_index.setdefault(key, ThresholdIndex()).add(rule)
+        if rule.drop_pct is not None:
+            self.drop_rules.setdefault(key, []).append(rule)
+        return rule
+
+    def register(self, rule):
+        self.index(rule)
+        self.save()
+        return rule
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump([rule.to_dict() for rule in self.rules], f, indent=2)
+
+    def save_state(self):
+        if self.state_path:
+            with open(self.state_path, 'w') as f:
+                json.dump(self.notified, f)
+
+    def match(self, product, search_term=None, base_url=BASE_URL):
+        keys = [('asin', base_url, product['asin'])] + ([('search', base_url, search_term)] if search_term else [])
+        matches = []
+        for key in keys:
+            if key in self.price_index:
+                matches.extend((rule, 'price') for rule in self.price_index[key].match(product['price']))
+            if key in self.drop_rules and self.history is not None:
+                low = self.history.get_lowest_price(product['asin'], base_url)
+                if low:
+                    drop = round((1 - product['price'] / low) * 100, 2)
+                    matches.extend((rule, 'drop') for rule in self.drop_rules[key] if drop >= rule.drop_pct)
+        return [(rule, reason) for rule, reason in matches if rule.matches_seller(product)]
+
+    def check(self, products, search_term=None, base_url=BASE_URL):
+        # Call before the run is added to the history, so drops compare against earlier runs
+        alerts = []
+        for product in products or []:
+            for rule, reason in self.match(product, search_term, base_url):
+                notified = self.notified.setdefault(rule.rule_id, {})
+                last = notified.get(product['asin'])
+                if last is not None and last <= product['price']:
+                    continue
+                notified[product['asin']] = product['price']
+                alerts.append({
+                    'date': datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+                    'user': rule.user,
+                    'rule_id': rule.rule_id,
+                    'reason': reason,
+                    'search_term': search_term,
+                    'base_url': base_url,
+                    'product': product
+                })
+        for alert in alerts:
+            for sink in self.sinks:
+                sink.send(alert)
+        if alerts:
+            self.save_state()
+            log.info("Sent %s price alerts", len(alerts))
+        return alerts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Register a price alert')
+    parser.add_argument('--user', required=True)
+    parser.add_argument('--asin')
+    parser.add_argument('--search-term')
+    parser.add_argument('--max-price', type=float)
+    parser.add_argument('--drop-pct', type=float, help='percent below the lowest price seen so far')
+    parser.add_argument('--seller')
+    parser.add_argument('--marketplace', choices=MARKETPLACES, help='store to watch, the configured one by default')
+    args = parser.parse_args()
+    base_url = MARKETPLACES[args.marketplace]['base_url'] if args.marketplace else BASE_URL
+    rule = AlertEngine(sinks=[]).register(AlertRule(args.user, asin=args.asin, search_term=args.search_term,
+                                                    max_price=args.max_price, drop_pct=args.drop_pct,
+                                                    seller=args.seller, base_url=base_url))
+    print(f"Registered alert {rule.rule_id}: {rule.to_dict()}")
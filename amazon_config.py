@@ -1,21 +1,126 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
+from functools import lru_cache
 
 DIRECTORY = 'reports'
 NAME = 'PS4'
-CURRENCY = '₹'
+# Marketplace profiles: base URL, currency, number locale of its prices (see price_parser.LOCALES) and the
+# language requested for product pages. marketplace_tracker.py compares several of them in one run.
+MARKETPLACES = {
+    'in': {'base_url': 'http://www.amazon.in/', 'currency': '₹', 'locale': 'en_IN', 'language': 'en_GB'},
+    'uk': {'base_url': 'https://www.amazon.co.uk/', 'currency': '£', 'locale': 'en_GB', 'language': 'en_GB'},
+    'us': {'base_url': 'https://www.amazon.com/', 'currency': '$', 'locale': 'en_US', 'language': 'en_US'},
+    'de': {'base_url': 'https://www.amazon.de/', 'currency': '€', 'locale': 'de_DE', 'language': 'en_GB'},
+    'fr': {'base_url': 'https://www.amazon.fr/', 'currency': '€', 'locale': 'fr_FR', 'language': 'en_GB'},
+    'it': {'base_url': 'https://www.amazon.it/', 'currency': '€', 'locale': 'it_IT', 'language': 'en_GB'},
+    'es': {'base_url': 'https://www.amazon.es/', 'currency': '€', 'locale': 'es_ES', 'language': 'en_GB'},
+    'jp': {'base_url': 'https://www.amazon.co.jp/', 'currency': '¥', 'locale': 'ja_JP', 'language': 'en_US'}
+}
+# Optional value of one unit of each currency in a common currency, e.g. {'₹': 1, '€': 90}; lets comparison
+# reports name the cheapest marketplace for a product
+EXCHANGE_RATES = None
+MARKETPLACE = 'in'
+CURRENCY = MARKETPLACES[MARKETPLACE]['currency']
+LOCALE = MARKETPLACES[MARKETPLACE]['locale']
+LANGUAGE = MARKETPLACES[MARKETPLACE]['language']
 MIN_PRICE = '20000'
 MAX_PRICE = '25000'
 FILTERS = {
     'min': MIN_PRICE,
     'max': MAX_PRICE
 }
-BASE_URL = "http://www.amazon.in/"
+BASE_URL = MARKETPLACES[MARKETPLACE]['base_url']
+# Search result pages to follow (1 = first page only) and optional cap on collected products
+MAX_PAGES = 1
+MAX_ITEMS = None
+# Search terms tracked by batch_tracker.py, see watchlist.example.json
+WATCHLIST = 'watchlist.json'
+# tracker_daemon.py re-polls each product between these intervals (seconds), often when the price is
+# volatile or within NEAR_TARGET (fraction) of the watchlist 'target', and re-runs searches every SEARCH_INTERVAL
+MIN_POLL_INTERVAL = 15 * 60
+MAX_POLL_INTERVAL = 24 * 60 * 60
+SEARCH_INTERVAL = 6 * 60 * 60
+NEAR_TARGET = 0.05
+# Product cache: title/seller are kept for a week, prices for an hour (seconds)
+CACHE_FILE = f'{DIRECTORY}/product_cache.json'
+CACHE_SIZE = 50000
+STATIC_TTL = 7 * 24 * 60 * 60
+PRICE_TTL = 60 * 60
+# Diff mode logs only new/removed/price-changed products and writes a full report every SNAPSHOT_EVERY runs
+DIFF_MODE = False
+SNAPSHOT_EVERY = 24
+STATE_DB = f'{DIRECTORY}/state.db'
+# Price alert rules registered with alerts.py, the local alert log, the last price each rule was sent for
+# (so later runs don't repeat it) and an optional webhook URL
+ALERT_RULES_FILE = 'alerts.json'
+ALERTS_LOG = f'{DIRECTORY}/alerts.ndjson'
+ALERT_STATE_FILE = f'{DIRECTORY}/alert_state.json'
+ALERT_WEBHOOK = None
+# SQLite index of every ASIN seen, with its canonical product URL
+ASIN_INDEX_DB = f'{DIRECTORY}/asins.db'
+# SQLite file holding every price observation across runs
+HISTORY_DB = f'{DIRECTORY}/history.db'
+# Columnar (NumPy) export of the price history used by price_analytics.py
+ANALYTICS_DIR = f'{DIRECTORY}/analytics'
+# Failed product fetches are retried RETRIES times with jittered exponential backoff (seconds). When at least
+# BREAKER_THRESHOLD of the last BREAKER_WINDOW fetches hit timeouts or captchas, fetching pauses for
+# BREAKER_COOLDOWN seconds. ASINs that still fail are kept in DEAD_LETTER_FILE for a targeted re-fetch.
+RETRIES = 2
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+BREAKER_WINDOW = 20
+BREAKER_THRESHOLD = 0.5
+BREAKER_COOLDOWN = 300
+DEAD_LETTER_FILE = f'{DIRECTORY}/dead_letters.json'
+# Finished products are journaled and fsynced every CHECKPOINT_EVERY products so --resume can skip them
+CHECKPOINT_EVERY = 10
+# Logging and metrics: LOG_LEVEL 'WARNING' silences progress output, LOG_STRUCTURED emits JSON lines.
+# A metrics snapshot is written to METRICS_FILE after a run; METRICS_PORT serves /metrics while running.
+LOG_LEVEL = 'INFO'
+LOG_STRUCTURED = False
+METRICS_ENABLED = True
+METRICS_FILE = f'{DIRECTORY}/metrics.json'
+METRICS_PORT = None
+# Local query API (query_api.py) over the reports and price history, re-indexed every API_REFRESH seconds
+API_HOST = '127.0.0.1'
+API_PORT = 8080
+API_REFRESH = 5
+# Serialized responses kept between refreshes, least recently used dropped first
+API_CACHE_SIZE = 1000
+# Number of browser sessions used to fetch product pages concurrently
+WORKERS = 1
+# Worker browser sessions are restarted after this many page loads or above this memory (MB, needs psutil)
+SESSION_MAX_PAGE_LOADS = 200
+SESSION_MAX_MEMORY_MB = 1500
+# Fast scrape profile: no images/media/fonts/ads, eager page loads, extraction waits only for the nodes it reads
+FAST_SCRAPE = False
+PAGE_WAIT = 5
+BLOCKED_URLS = [
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*.mp4', '*.webm', '*.mp3', '*.m3u8',
+    '*amazon-adsystem.com*', '*doubleclick.net*', '*googlesyndication.com*', '*fls-*.amazon.*'
+]
+# Processes parsing product pages apart from fetching; fetch threads then only capture the page HTML.
+# 0 extracts the fields in the browser as each page loads.
+PARSE_PROCESSES = 0
+# Path to a chromedriver binary; None resolves it once per process with webdriver_manager
+DRIVER_PATH = None
+# 'selenium' renders product pages in Chrome, 'http' fetches them with requests and falls back to Chrome,
+# 'replay' serves pages recorded earlier (simple_tracker.py --record) from PAGE_STORE_DIR without any network
+BACKEND = 'selenium'
+PAGE_STORE_DIR = f'{DIRECTORY}/pages'
+# Reports of replayed runs, kept apart so they never replace the live reports
+REPLAY_DIR = f'{DIRECTORY}/replays'
+
+@lru_cache(maxsize=None)
+def get_chrome_driver_path():
+    # Automatically download and install ChromeDriver, only once per process
+    return DRIVER_PATH or ChromeDriverManager().install()
 
 def get_chrome_web_driver(options):
-    # Automatically download and install ChromeDriver
-    service = Service(ChromeDriverManager().install())  # Create a Service object
+    service = Service(get_chrome_driver_path())  # Create a Service object
     return webdriver.Chrome(service=service, options=options)  # Pass the service and options
 
 def get_web_driver_options():
@@ -28,4 +133,25 @@ def set_browser_as_incognito(options):
     options.add_argument('--incognito')
 
 def set_automation_as_head_less(options):
-    options.add_argument('--headless')
\ No newline at end of file
+    options.add_argument('--headless')
+
+def set_fast_scrape_profile(options):
+    # Don't wait for subresources once the DOM is parsed, and skip everything we never read
+    options.page_load_strategy = 'eager'
+    options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+        'profile.managed_default_content_settings.media_stream': 2,
+        'profile.default_content_setting_values.notifications': 2,
+        'profile.default_content_setting_values.geolocation': 2
+    })
+    for argument in ('--blink-settings=imagesEnabled=false', '--autoplay-policy=user-gesture-required',
+                     '--disable-extensions', '--disable-gpu', '--disable-dev-shm-usage', '--disable-sync',
+                     '--disable-background-networking', '--disable-default-apps', '--disable-notifications',
+                     '--disable-features=Translate,MediaRouter,OptimizationHints', '--mute-audio',
+                     '--no-first-run'):
+        options.add_argument(argument)
+
+def block_resources(driver):
+    # Fonts, media and ad hosts can only be blocked per request, through the DevTools protocol
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URLS})
@@ -0,0 +1,79 @@
+import re
+import sqlite3
+from urllib.parse import parse_qs, unquote
+from amazon_config import ASIN_INDEX_DB
+from price_history import get_now
+
+# ASINs are 10 upper-case letters/digits following one of Amazon's product path prefixes
+ASIN_PATTERN = re.compile(
+    r'/(?:dp|d|gp/product|gp/aw/d|gp/offer-listing|exec/obidos/ASIN|exec/obidos/tg/detail/-|product-reviews)'
+    r'/([A-Z0-9]{10})(?=[/?#&]|$)',
+    re.IGNORECASE
+)
+# Sponsored (/sspa/click) and redirect links carry the product path in a query parameter
+REDIRECT_PARAMS = ('url', 'u', 'dest', 'redirectUrl')
+
+
+def extract_asin(link):
+    if not link:
+        return None
+    path, _, query = link.strip().partition('?')
+    match = ASIN_PATTERN.search(path)
+    if match:
+        return match.group(1).upper()
+    if query:
+        params = parse_qs(query)
+        for param in REDIRECT_PARAMS:
+            for target in params.get(param, []):
+                asin = extract_asin(unquote(target))
+                if asin:
+                    return asin
+    match = ASIN_PATTERN.search(unquote(path))
+    return match.group(1).upper() if match else None
+
+
+def get_canonical_url(base_url, asin):
+    return f'{base_url}dp/{asin}'
+
+
+class AsinIndex:
+    # Every ASIN seen so far with its canonical URL, plus the set seen during this run
+    def __init__(self, path=ASIN_INDEX_DB):
+        self.seen = set()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS asins (
+                asin TEXT NOT NULL,
+                base_url TEXT NOT NULL,
+                url TEXT NOT NULL,
+                search_term TEXT,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                PRIMARY KEY (asin, base_url)
+            )
+        """)
+
+    def add(self, asins, base_url, search_term=None):
+        # Returns the ASINs not seen before in this run
+        new = [asin for asin in dict.fromkeys(asins) if asin not in self.seen]
+        self.seen.update(new)
+        now = get_now()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO asins VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(asin, base_url) DO UPDATE SET last_seen = excluded.last_seen',
+                [(asin, base_url, get_canonical_url(base_url, asin), search_term, now, now) for asin in new]
+            )
+        return new
+
+    def get_url(self, asin, base_url):
+        row = self.connection.execute(
+            'SELECT url FROM asins WHERE asin = ? AND base_url = ?', (asin, base_url)
+        ).fetchone()
+        return row[0] if row else None
+
+    def __contains__(self, asin):
+        return asin in self.seen
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,140 @@
+import time
+import asyncio
+import logging
+from urllib.parse import urlparse
+from http_backend import HttpBackend, get_search_url
+from product_parser import parse_product_page, parse_search_links
+from simple_tracker import AmazonAPI
+from streaming_report import StreamingReport
+from metrics import configure_logging
+from amazon_config import (
+    NAME,
+    CURRENCY,
+    FILTERS,
+    BASE_URL,
+    LANGUAGE
+)
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    # Allows `rate` requests per second with bursts of up to `capacity`
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncPipeline:
+    # search pages -> ASIN queue -> fetchers -> product queue -> writer, all running concurrently
+    def __init__(self, search_term, filters, base_url, currency, concurrency=8, rate=2.0, burst=4,
+                 queue_size=100, pages=1, http_backend=None, sink=None, language=LANGUAGE, locale=None):
+        self.search_term = search_term
+        self.language = language
+        self.locale = locale
+        self.filters = filters
+        self.base_url = base_url
+        self.currency = currency
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.queue_size = queue_size
+        self.pages = pages
+        self.http_backend = http_backend or HttpBackend(pool_size=concurrency)
+        # Products are written as they arrive, so nothing here grows with the result count
+        self.sink = sink or StreamingReport(search_term, filters, base_url, currency, output_format='ndjson')
+        self.semaphore = None
+        self.buckets = {}
+        self.written = 0
+
+    def get_bucket(self, url):
+        host = urlparse(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return self.buckets[host]
+
+    async def get_page(self, url):
+        async with self.semaphore:
+            await self.get_bucket(url).acquire()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.http_backend.get_page, url)
+
+    async def produce_asins(self, asin_queue):
+        seen = set()
+        for page in range(1, self.pages + 1):
+            url = get_search_url(self.base_url, self.search_term, self.filters, page)
+            try:
+                html = await self.get_page(url)
+            except Exception as e:
+                log.warning("Search page failed: %s: %s", url, e)
+                break
+            links = parse_search_links(html, self.base_url)
+            log.info("Found %s product links on page %s", len(links), page)
+            for link in links:
+                asin = AmazonAPI.get_asin(link)
+                if asin and asin not in seen:
+                    seen.add(asin)
+                    # Blocks when fetchers fall behind, so memory stays bounded by the queue size
+                    await asin_queue.put(asin)
+
+    async def fetch_products(self, asin_queue, product_queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            asin = await asin_queue.get()
+            if asin is None:
+                return
+            url = f'{self.base_url}dp/{asin}'
+            try:
+                html = await self.get_page(f'{url}?language={self.language}')
+                fields = await loop.run_in_executor(None, parse_product_page, html, self.currency, self.locale)
+            except Exception as e:
+                log.warning("Error accessing product URL: %s: %s", url, e)
+                continue
+            if all(fields.values()):
+                await product_queue.put({'asin': asin, 'url': url, **fields})
+
+    async def write_products(self, product_queue):
+        while True:
+            product = await product_queue.get()
+            if product is None:
+                return
+            self.sink.write(product)
+            self.written += 1
+
+    async def run(self):
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        asin_queue = asyncio.Queue(maxsize=self.queue_size)
+        product_queue = asyncio.Queue(maxsize=self.queue_size)
+        fetchers = [asyncio.create_task(self.fetch_products(asin_queue, product_queue))
+                    for _ in range(self.concurrency)]
+        writer = asyncio.create_task(self.write_products(product_queue))
+        try:
+            await self.produce_asins(asin_queue)
+            for _ in fetchers:
+                await asin_queue.put(None)
+            await asyncio.gather(*fetchers)
+            await product_queue.put(None)
+            await writer
+        finally:
+            self.sink.close()
+        log.info("Wrote %s products", self.written)
+        return self.written
+
+
+if __name__ == '__main__':
+    configure_logging()
+    asyncio.run(AsyncPipeline(NAME, FILTERS, BASE_URL, CURRENCY).run())
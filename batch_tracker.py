@@ -0,0 +1,123 @@
+import sys
+import json
+import logging
+from simple_tracker import AmazonAPI, GenerateReport
+from price_history import PriceHistory
+from metrics import metrics, configure_logging
+from resilience import CircuitBreaker, DeadLetterList
+from alerts import AlertEngine
+from product_cache import ProductCache
+from amazon_config import (
+    MARKETPLACES,
+    MARKETPLACE,
+    WORKERS,
+    BACKEND,
+    FAST_SCRAPE,
+    RETRIES,
+    MAX_PAGES,
+    MAX_ITEMS,
+    WATCHLIST,
+    METRICS_FILE,
+    METRICS_PORT
+)
+
+log = logging.getLogger(__name__)
+
+
+def load_watchlist(path):
+    with open(path) as f:
+        entries = json.load(f)
+    watchlist = []
+    seen = set()
+    for entry in entries:
+        # Entries default to the configured marketplace; explicit currency/base_url still win
+        profile = MARKETPLACES[entry.get('marketplace', MARKETPLACE)]
+        # The same search term may be watched on several stores, so entries naming a marketplace get their
+        # own report, e.g. reports/Iphone.de.json like marketplace_tracker writes
+        report_name = f"{entry['name']}.{entry['marketplace']}" if 'marketplace' in entry else entry['name']
+        if report_name in seen:
+            log.warning("Skipped duplicate watchlist entry %s", report_name)
+            continue
+        seen.add(report_name)
+        watchlist.append({
+            'name': entry['name'],
+            'report_name': report_name,
+            'filters': {'min': entry['min'], 'max': entry['max']},
+            'currency': entry.get('currency', profile['currency']),
+            'base_url': entry.get('base_url', profile['base_url']),
+            'language': entry.get('language', profile['language']),
+            # Without a marketplace the locale follows the currency, which may have been overridden
+            'locale': entry.get('locale', profile['locale'] if 'marketplace' in entry else None),
+            'target': entry.get('target')
+        })
+    return watchlist
+
+
+class BatchTracker:
+    # Runs every query of a watchlist on one set of warm browser sessions
+    def __init__(self, watchlist, workers=WORKERS, backend=BACKEND, history=None, cache=None, dead_letters=None,
+                 alerts=None):
+        self.watchlist = watchlist
+        self.alerts = alerts
+        self.dead_letters = dead_letters
+        self.cache = cache
+        self.workers = workers
+        self.backend = backend
+        self.history = history
+        # (base_url, asin) -> product, so an ASIN found by several queries is fetched once
+        self.products = {}
+
+    def run(self):
+        if not self.watchlist:
+            log.warning("Watchlist is empty.")
+            return {}
+        first = self.watchlist[0]
+        api = AmazonAPI(first['name'], first['filters'], first['base_url'], first['currency'],
+                        workers=self.workers, backend=self.backend, cache=self.cache,
+                        max_pages=MAX_PAGES, max_items=MAX_ITEMS, fast_scrape=FAST_SCRAPE,
+                        retries=RETRIES, breaker=CircuitBreaker(), dead_letters=self.dead_letters,
+                        language=first['language'], locale=first['locale'])
+        results = {}
+        try:
+            for query in self.watchlist:
+                api.set_query(query['name'], query['filters'], currency=query['currency'],
+                              base_url=query['base_url'], language=query['language'], locale=query['locale'])
+                results[query['report_name']] = self.run_query(api, query)
+        finally:
+            api.quit()
+        return results
+
+    def run_query(self, api, query):
+        log.info("Looking for %s products...", query['report_name'])
+        try:
+            links = api.get_products_links()
+        except Exception as e:
+            log.warning("Search failed for %s: %s", query['report_name'], e)
+            return []
+        asins = api.get_asins(links)
+        missing = [asin for asin in asins if (query['base_url'], asin) not in self.products]
+        log.info("Got %s products, %s already fetched in this batch...", len(asins), len(asins) - len(missing))
+        for asin, product in zip(missing, api.fetch_products(missing)):
+            self.products[(query['base_url'], asin)] = product
+        products = [self.products[(query['base_url'], asin)] for asin in asins]
+        products = [product for product in products if product]
+        GenerateReport(query['report_name'], query['filters'], query['base_url'], query['currency'], products,
+                       history=self.history, alerts=self.alerts, search_term=query['name'])
+        return products
+
+
+if __name__ == '__main__':
+    configure_logging()
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+    history = PriceHistory()
+    cache = ProductCache()
+    dead_letters = DeadLetterList()
+    BatchTracker(load_watchlist(sys.argv[1] if len(sys.argv) > 1 else WATCHLIST), history=history, cache=cache,
+                 dead_letters=dead_letters, alerts=AlertEngine(history=history)).run()
+    cache.save()
+    dead_letters.save()
+    log.info("Cache stats: %s", cache.get_stats())
+    history.close()
+    if METRICS_FILE:
+        metrics.write_snapshot(METRICS_FILE)
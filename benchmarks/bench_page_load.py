@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+import argparse
+from statistics import median
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simple_tracker import AmazonAPI  # noqa: E402
+from amazon_config import NAME, FILTERS, BASE_URL, CURRENCY  # noqa: E402
+
+# Live comparison of product page latency with the default and the fast scrape Chrome profile.
+# Needs network access and Chrome, unlike run_benchmarks.py.
+
+
+def time_profile(asins, fast_scrape):
+    api = AmazonAPI(NAME, FILTERS, BASE_URL, CURRENCY, fast_scrape=fast_scrape)
+    latencies = []
+    try:
+        for asin in asins:
+            started = time.perf_counter()
+            api.get_product_fields_from_driver(api.shorten_url(asin))
+            latencies.append(time.perf_counter() - started)
+    finally:
+        api.quit()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-page latency of the default vs fast scrape profile')
+    parser.add_argument('asins', nargs='+')
+    args = parser.parse_args()
+    results = {profile: time_profile(args.asins, profile == 'fast') for profile in ('default', 'fast')}
+    for profile, latencies in results.items():
+        print(f"{profile:<8} median {median(latencies):.2f}s  max {max(latencies):.2f}s over {len(latencies)} pages")
+    reduction = 1 - median(results['fast']) / median(results['default'])
+    print(f"Median per-page latency reduction: {reduction:.0%}")
+
+
+if __name__ == '__main__':
+    main()
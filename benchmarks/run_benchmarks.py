@@ -0,0 +1,139 @@
+import os
+import sys
+import json
+import time
+import argparse
+import functools
+import tempfile
+import tracemalloc
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from product_parser import (  # noqa: E402
+    PARSER,
+    parse_product_page,
+    parse_search_results,
+    get_title,
+    get_seller,
+    get_price,
+    convert_price
+)
+from price_parser import parse_prices  # noqa: E402
+from simple_tracker import AmazonAPI, GenerateReport  # noqa: E402
+from streaming_report import StreamingReport  # noqa: E402
+from test_data import test_data  # noqa: E402
+
+# Offline benchmarks: replays saved HTML fixtures through the parsers and runs the
+# report/price helpers on synthetic datasets scaled up from test_data.py.
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+BASE_URL = 'http://www.amazon.in/'
+CURRENCY = '₹'
+DEFAULT_SIZES = (1000, 100000, 1000000)
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def make_products(size):
+    products = []
+    for i in range(size):
+        product = dict(test_data[i % len(test_data)])
+        product['asin'] = f"B{i:09d}"
+        product['price'] = round(product['price'] + (i % 97) * 0.5, 2)
+        products.append(product)
+    return products
+
+
+def percentile(latencies, fraction):
+    index = min(len(latencies) - 1, int(round(fraction * (len(latencies) - 1))))
+    return latencies[index]
+
+
+def bench(name, func, inputs, items_per_call=1):
+    # Timing pass without tracemalloc (it slows allocation-heavy code), then a memory pass
+    latencies = []
+    started = time.perf_counter()
+    for args in inputs:
+        call_started = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - call_started)
+    total = time.perf_counter() - started
+    tracemalloc.start()
+    func(*inputs[0])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    latencies.sort()
+    result = {
+        'name': name,
+        'calls': len(inputs),
+        'throughput': len(inputs) * items_per_call / total if total else float('inf'),
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_kb': peak / 1024
+    }
+    print(f"{name:<36} {result['throughput']:>14,.1f}/s  p50 {result['p50_ms']:>9.3f}ms  "
+          f"p95 {result['p95_ms']:>9.3f}ms  p99 {result['p99_ms']:>9.3f}ms  peak {result['peak_kb']:>10,.1f}KB")
+    return result
+
+
+def bench_parsing(repeat):
+    search_page = load_fixture('search_page.html')
+    product_page = load_fixture('product_page.html')
+    product_soup = BeautifulSoup(product_page, PARSER)
+    results = parse_search_results(search_page, BASE_URL, CURRENCY)
+    links = [result['link'] for result in results]
+    return [
+        bench('parse_search_results', parse_search_results, [(search_page, BASE_URL, CURRENCY)] * repeat,
+              items_per_call=len(results)),
+        bench('parse_product_page', parse_product_page, [(product_page, CURRENCY)] * repeat),
+        bench('get_title', get_title, [(product_soup,)] * repeat * 10),
+        bench('get_seller', get_seller, [(product_soup,)] * repeat * 10),
+        bench('get_price', get_price, [(product_soup, CURRENCY)] * repeat * 10),
+        bench('get_asin', AmazonAPI.get_asin, [(link,) for link in links] * repeat * 10)
+    ]
+
+
+def bench_datasets(sizes):
+    results = []
+    for size in sizes:
+        products = make_products(size)
+        raw_prices = [(f"{CURRENCY}{product['price']:,.2f}", CURRENCY) for product in products]
+        links = [(f"{BASE_URL}Some-Product/dp/{product['asin']}/ref=sr_1_1",) for product in products]
+        results.append(bench(f'convert_price[{size}]', convert_price, raw_prices))
+        results.append(bench(f'parse_prices[{size}]', parse_prices,
+                             [([raw for raw, _ in raw_prices], None, CURRENCY)], items_per_call=size))
+        results.append(bench(f'get_asin[{size}]', AmazonAPI.get_asin, links))
+        with tempfile.TemporaryDirectory() as directory:
+            generate_report = functools.partial(GenerateReport, directory=directory)
+            results.append(bench(f'GenerateReport[{size}]', generate_report,
+                                 [('bench', {'min': '0', 'max': '1000'}, BASE_URL, CURRENCY, products)],
+                                 items_per_call=size))
+            results.append(bench(f'StreamingReport[{size}]', stream_report, [(products, directory)],
+                                 items_per_call=size))
+    return results
+
+
+def stream_report(products, directory):
+    with StreamingReport('bench', {'min': '0', 'max': '1000'}, BASE_URL, CURRENCY, directory=directory) as report:
+        for product in products:
+            report.write(product)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline parsing and report benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=50, help='fixture replays per parser benchmark')
+    parser.add_argument('--output', help='write results as JSON, e.g. for CI comparisons')
+    args = parser.parse_args()
+    results = bench_parsing(args.repeat) + bench_datasets(args.sizes)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import json
+import logging
+import sqlite3
+from datetime import datetime
+from amazon_config import STATE_DB, SNAPSHOT_EVERY, DIRECTORY
+
+log = logging.getLogger(__name__)
+
+TRACKED_FIELDS = ('url', 'title', 'seller', 'price')
+
+
+class ChangeDetector:
+    # Keeps the last known state per ASIN and logs only what changed between runs
+    def __init__(self, name, path=STATE_DB, snapshot_every=SNAPSHOT_EVERY, directory=DIRECTORY):
+        self.name = name
+        self.snapshot_every = snapshot_every
+        self.delta_path = f'{directory}/{name}.delta.ndjson'
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS state (
+                name TEXT NOT NULL,
+                asin TEXT NOT NULL,
+                url TEXT,
+                title TEXT,
+                seller TEXT,
+                price REAL,
+                PRIMARY KEY (name, asin)
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                name TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            );
+        """)
+
+    def get_state(self):
+        rows = self.connection.execute(
+            'SELECT asin, url, title, seller, price FROM state WHERE name = ?', (self.name,)
+        )
+        return {row[0]: dict(zip(TRACKED_FIELDS, row[1:])) for row in rows}
+
+    def diff(self, products, failed=()):
+        # ASINs whose fetch failed this run are not counted as removed
+        previous = self.get_state()
+        current = {product['asin']: product for product in products}
+        failed = set(failed)
+        added = [product for asin, product in current.items() if asin not in previous]
+        removed = [asin for asin in previous if asin not in current and asin not in failed]
+        changed = []
+        for asin, product in current.items():
+            old = previous.get(asin)
+            if old and old['price'] != product['price']:
+                changed.append({'asin': asin, 'old_price': old['price'], 'price': product['price']})
+        return {'added': added, 'removed': removed, 'changed': changed}
+
+    def save_delta(self, delta):
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?, ?, ?)',
+                [(self.name, p['asin'], p['url'], p['title'], p['seller'], p['price']) for p in delta['added']]
+            )
+            self.connection.executemany(
+                'UPDATE state SET price = ? WHERE name = ? AND asin = ?',
+                [(change['price'], self.name, change['asin']) for change in delta['changed']]
+            )
+            self.connection.executemany(
+                'DELETE FROM state WHERE name = ? AND asin = ?',
+                [(self.name, asin) for asin in delta['removed']]
+            )
+            self.connection.execute(
+                'INSERT INTO runs VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET count = count + 1', (self.name,)
+            )
+
+    def get_run_count(self):
+        row = self.connection.execute('SELECT count FROM runs WHERE name = ?', (self.name,)).fetchone()
+        return row[0] if row else 0
+
+    def record(self, products, failed=()):
+        # Appends this run's delta to the log; returns True when a full snapshot is due.
+        # A failed or empty scrape says nothing about what is listed, so the state is left alone.
+        if not products:
+            log.warning("No products in this run, keeping the previous state")
+            return False
+        delta = self.diff(products, failed)
+        self.save_delta(delta)
+        if delta['added'] or delta['removed'] or delta['changed']:
+            with open(self.delta_path, 'a') as f:
+                f.write(json.dumps({'date': datetime.now().strftime("%d/%m/%Y %H:%M:%S"), **delta}) + '\n')
+        log.info("Changes: %s new, %s removed, %s price changes",
+                 len(delta['added']), len(delta['removed']), len(delta['changed']))
+        return (self.get_run_count() - 1) % self.snapshot_every == 0
+
+    def close(self):
+        self.connection.close()
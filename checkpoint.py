@@ -0,0 +1,67 @@
+import os
+import json
+import threading
+from amazon_config import DIRECTORY, CHECKPOINT_EVERY
+
+
+class CheckpointJournal:
+    # Append-only journal of a run: the search links, then one line per finished product.
+    # Lines are fsynced every `sync_every` products, so a crash loses at most that many.
+    def __init__(self, name, directory=DIRECTORY, sync_every=CHECKPOINT_EVERY, resume=False):
+        self.path = f'{directory}/{name}.journal.ndjson'
+        self.sync_every = sync_every
+        self.lock = threading.Lock()
+        self.links = None
+        self.products = {}
+        self.pending = 0
+        if resume and os.path.exists(self.path):
+            self.load()
+        self.file = open(self.path, 'a' if resume else 'w')
+
+    def load(self):
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line may be cut short by the crash
+                    continue
+                if 'links' in entry:
+                    self.links = entry['links']
+                elif entry.get('product'):
+                    self.products[entry['asin']] = entry['product']
+
+    def write(self, entry, sync=False):
+        with self.lock:
+            self.file.write(json.dumps(entry) + '\n')
+            self.pending += 1
+            if sync or self.pending >= self.sync_every:
+                self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def record_links(self, links):
+        self.links = links
+        self.write({'links': links}, sync=True)
+
+    def record(self, asin, product):
+        if product:
+            self.products[asin] = product
+        self.write({'asin': asin, 'product': product})
+
+    def get(self, asin):
+        return self.products.get(asin)
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.sync()
+                self.file.close()
+
+    def clear(self):
+        # The run finished and its report is written, nothing left to resume
+        self.close()
+        os.remove(self.path)
@@ -0,0 +1,50 @@
+import logging
+import requests
+from urllib.parse import urlencode
+from requests.adapters import HTTPAdapter
+from product_parser import parse_product_page_safely
+from metrics import metrics
+from resilience import CaptchaError, is_captcha
+
+log = logging.getLogger(__name__)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/120.0 Safari/537.36',
+    'Accept-Language': 'en-GB,en;q=0.9',
+    'Accept': 'text/html,application/xhtml+xml'
+}
+
+
+def get_search_url(base_url, search_term, filters, page=1):
+    params = {'k': search_term, 'low-price': filters['min'], 'high-price': filters['max']}
+    if page > 1:
+        params['page'] = page
+    return f"{base_url}s?{urlencode(params)}"
+
+
+class HttpBackend:
+    # Fetches pages over one keep-alive session instead of rendering them in Chrome
+    def __init__(self, pool_size=10, timeout=10):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_page(self, url):
+        with metrics.timer('page_load_seconds', backend='http'):
+            response = self.session.get(url, timeout=self.timeout)
+        if response.status_code == 503 or is_captcha(response.text):
+            raise CaptchaError(f"Robot check on {url}")
+        response.raise_for_status()
+        return response.text
+
+    def get_product_fields(self, url, currency, locale=None):
+        # Fetch errors (robot checks included) go to the caller's retries and circuit breaker;
+        # only a page that can't be parsed returns None, so the browser can take over
+        return parse_product_page_safely(self.get_page(url), url, currency, locale)
+
+    def close(self):
+        self.session.close()
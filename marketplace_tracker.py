@@ -0,0 +1,121 @@
+import json
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from simple_tracker import AmazonAPI, GenerateReport
+from metrics import configure_logging
+from resilience import CircuitBreaker
+from amazon_config import (
+    DIRECTORY,
+    NAME,
+    FILTERS,
+    MARKETPLACES,
+    EXCHANGE_RATES,
+    WORKERS,
+    BACKEND,
+    MAX_PAGES,
+    MAX_ITEMS,
+    FAST_SCRAPE,
+    RETRIES
+)
+
+log = logging.getLogger(__name__)
+
+
+def parse_marketplace(arg):
+    # 'de' or 'de:200-250'; price filters are per marketplace because currencies differ
+    name, _, prices = arg.partition(':')
+    profile = dict(MARKETPLACES[name], name=name, filters=FILTERS)
+    if prices:
+        low, _, high = prices.partition('-')
+        profile['filters'] = {'min': low, 'max': high}
+    return profile
+
+
+def join_by_asin(results, rates=None):
+    # [(marketplace, products)] -> one entry per ASIN with its offer on every marketplace that has it
+    joined = {}
+    for marketplace, products in results:
+        for product in products:
+            entry = joined.setdefault(product['asin'], {'asin': product['asin'], 'title': product['title'],
+                                                        'offers': {}})
+            entry['offers'][marketplace['name']] = {
+                'price': product['price'],
+                'currency': marketplace['currency'],
+                'seller': product['seller'],
+                'url': product['url']
+            }
+    for entry in joined.values():
+        offers = entry['offers']
+        if rates and all(offer['currency'] in rates for offer in offers.values()):
+            entry['cheapest'] = min(offers, key=lambda name: offers[name]['price'] * rates[offers[name]['currency']])
+    # Products sold on most marketplaces first, they are the ones worth comparing
+    return sorted(joined.values(), key=lambda entry: (-len(entry['offers']), entry['asin']))
+
+
+class MarketplaceTracker:
+    # Runs one search on several marketplaces at once, each with its own browser sessions, and joins the
+    # results by ASIN. Comparisons are one-off snapshots, so their prices are not added to the history.
+    def __init__(self, search_term, marketplaces, workers=WORKERS, backend=BACKEND, rates=EXCHANGE_RATES,
+                 directory=DIRECTORY):
+        self.search_term = search_term
+        self.marketplaces = marketplaces
+        self.workers = workers
+        self.backend = backend
+        self.rates = rates
+        self.directory = directory
+
+    def run_marketplace(self, marketplace):
+        api = None
+        try:
+            api = AmazonAPI(self.search_term, marketplace['filters'], marketplace['base_url'],
+                            marketplace['currency'], workers=self.workers, backend=self.backend,
+                            max_pages=MAX_PAGES, max_items=MAX_ITEMS, fast_scrape=FAST_SCRAPE, retries=RETRIES,
+                            breaker=CircuitBreaker(), language=marketplace['language'],
+                            locale=marketplace['locale'])
+            products = api.run() or []
+        except Exception as e:
+            log.warning("Run failed on %s: %s", marketplace['base_url'], e)
+            return []
+        finally:
+            if api is not None:
+                api.quit()
+        GenerateReport(f"{self.search_term}.{marketplace['name']}", marketplace['filters'],
+                       marketplace['base_url'], marketplace['currency'], products, directory=self.directory)
+        return products
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=len(self.marketplaces)) as executor:
+            results = list(zip(self.marketplaces, executor.map(self.run_marketplace, self.marketplaces)))
+        comparison = join_by_asin(results, self.rates)
+        self.write_report(results, comparison)
+        return comparison
+
+    def write_report(self, results, comparison):
+        report = {
+            'title': self.search_term,
+            'date': datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+            'marketplaces': {
+                marketplace['name']: {
+                    'base_url': marketplace['base_url'],
+                    'currency': marketplace['currency'],
+                    'filters': marketplace['filters'],
+                    'count': len(products)
+                } for marketplace, products in results
+            },
+            'comparison': comparison
+        }
+        log.info("Creating comparison report...")
+        with open(f'{self.directory}/{self.search_term}.comparison.json', 'w') as f:
+            json.dump(report, f)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare one search across Amazon marketplaces')
+    parser.add_argument('--search-term', default=NAME)
+    parser.add_argument('marketplaces', nargs='+', help=f"e.g. in:20000-25000 de:200-250 ({', '.join(MARKETPLACES)})")
+    args = parser.parse_args()
+    configure_logging()
+    comparison = MarketplaceTracker(args.search_term, [parse_marketplace(arg) for arg in args.marketplaces]).run()
+    log.info("Compared %s products", len(comparison))
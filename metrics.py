@@ -0,0 +1,188 @@
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from amazon_config import METRICS_ENABLED, LOG_LEVEL, LOG_STRUCTURED
+
+# Latency buckets in seconds, from fast DOM lookups to slow page loads
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LOG_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class StructuredFormatter(logging.Formatter):
+    # One JSON object per line; anything passed through `extra=` becomes a field
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in LOG_RECORD_FIELDS})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=LOG_LEVEL, structured=LOG_STRUCTURED):
+    handler = logging.StreamHandler()
+    handler.setFormatter(StructuredFormatter() if structured else logging.Formatter('%(message)s'))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {'buckets': dict(zip(map(str, self.buckets + ('+Inf',)), self.counts)),
+                'sum': self.sum, 'count': self.count}
+
+
+class Timer:
+    def __init__(self, metrics, name, labels, asin=None):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.asin = asin
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        self.metrics.observe(self.name, seconds, **self.labels)
+        if self.asin:
+            self.metrics.record_asin(self.asin, seconds)
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+def get_key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}' if pairs else ''
+
+
+class Metrics:
+    # Counters, latency histograms and per-ASIN timings; all calls are no-ops when disabled
+    def __init__(self, enabled=METRICS_ENABLED, buckets=DEFAULT_BUCKETS, max_asins=10000):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.max_asins = max_asins
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.asin_seconds = OrderedDict()
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = get_key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = get_key(name, labels)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(self.buckets)
+            self.histograms[key].observe(value)
+
+    def timer(self, name, asin=None, **labels):
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, name, labels, asin)
+
+    def record_asin(self, asin, seconds):
+        with self.lock:
+            self.asin_seconds[asin] = seconds
+            self.asin_seconds.move_to_end(asin)
+            if len(self.asin_seconds) > self.max_asins:
+                self.asin_seconds.popitem(last=False)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in self.counters.items()],
+                'histograms': [{'name': name, 'labels': dict(labels), **histogram.to_dict()}
+                               for (name, labels), histogram in self.histograms.items()],
+                'asin_seconds': dict(self.asin_seconds)
+            }
+
+    def write_snapshot(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f'{name}{format_labels(labels)} {value}')
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{format_labels(labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} {histogram.sum}')
+                lines.append(f'{name}_count{format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        # Exposes /metrics in the Prometheus text format from a background thread
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+metrics = Metrics()
@@ -0,0 +1,118 @@
+import os
+import logging
+import gzip
+import hashlib
+import sqlite3
+import threading
+from amazon_config import PAGE_STORE_DIR
+from price_history import get_now
+from product_parser import parse_product_page, parse_product_page_safely
+from resilience import FetchError
+
+log = logging.getLogger(__name__)
+
+
+class PageNotRecorded(FetchError):
+    kind = 'not_recorded'
+    retryable = False
+
+
+class PageStore:
+    # Fetched pages, gzipped under objects/ and named by the SHA-256 of their content, so identical pages
+    # are stored once. pages.db maps each URL to the digest of the page last recorded for it.
+    def __init__(self, directory=PAGE_STORE_DIR):
+        self.directory = directory
+        os.makedirs(f'{directory}/objects', exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(f'{directory}/pages.db', check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                recorded_at TEXT NOT NULL
+            )
+        """)
+
+    def get_object_path(self, digest):
+        return f'{self.directory}/objects/{digest[:2]}/{digest}.html.gz'
+
+    def put(self, url, html):
+        content = html.encode()
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.get_object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written under a temporary name so a crash never leaves a truncated object behind
+            temporary = f'{path}.{threading.get_ident()}.tmp'
+            with gzip.open(temporary, 'wb', compresslevel=6) as f:
+                f.write(content)
+            os.replace(temporary, path)
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?)', (url, digest, get_now()))
+        return digest
+
+    def get_digest(self, url):
+        with self.lock:
+            row = self.connection.execute('SELECT digest FROM pages WHERE url = ?', (url,)).fetchone()
+        return row[0] if row else None
+
+    def read(self, digest):
+        with gzip.open(self.get_object_path(digest), 'rb') as f:
+            return f.read().decode()
+
+    def get(self, url):
+        digest = self.get_digest(url)
+        return self.read(digest) if digest else None
+
+    def get_pages(self, prefix=''):
+        # (url, digest) of every recorded page whose URL starts with prefix
+        with self.lock:
+            return self.connection.execute(
+                'SELECT url, digest FROM pages WHERE url >= ? AND url < ? ORDER BY url', (prefix, prefix + '\uffff')
+            ).fetchall()
+
+    def get_urls(self, prefix=''):
+        return [url for url, _ in self.get_pages(prefix)]
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+class RecordingBackend:
+    # Passes requests on to another backend and stores every page it returns
+    def __init__(self, backend, store):
+        self.backend = backend
+        self.store = store
+
+    def get_page(self, url):
+        html = self.backend.get_page(url)
+        self.store.put(url, html)
+        return html
+
+    def get_product_fields(self, url, currency, locale=None):
+        return parse_product_page_safely(self.get_page(url), url, currency, locale)
+
+    def close(self):
+        self.backend.close()
+
+
+class ReplayBackend:
+    # Serves recorded pages instead of fetching them; a page that was never recorded is an error
+    def __init__(self, store):
+        self.store = store
+
+    def get_page(self, url):
+        html = self.store.get(url)
+        if html is None:
+            raise PageNotRecorded(f"No recorded page for {url}")
+        return html
+
+    def get_product_fields(self, url, currency, locale=None):
+        return parse_product_page(self.get_page(url), currency, locale)
+
+    def close(self):
+        pass
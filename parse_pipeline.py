@@ -0,0 +1,152 @@
+import os
+import gzip
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+import multiprocessing
+from urllib.parse import urlsplit
+from concurrent.futures import ProcessPoolExecutor
+from amazon_config import MARKETPLACES, CURRENCY, PARSE_PROCESSES
+from product_parser import parse_product_page
+from resilience import ParseError, classify_error
+from asin_index import extract_asin
+from metrics import configure_logging
+
+log = logging.getLogger(__name__)
+
+
+def parse_object(path, currency, locale=None):
+    # Runs in the worker processes, which read the page themselves instead of receiving it pickled
+    try:
+        with gzip.open(path, 'rb') as f:
+            return parse_product_page(f.read().decode(), currency, locale)
+    except Exception as e:
+        log.warning("Can't parse %s: %s", path, e)
+        return None
+
+
+class ParsePipeline:
+    # fetchers (threads) -> bounded page queue -> parsers (processes). Fetchers only capture raw HTML, so
+    # page loads and the CPU-bound parsing overlap. At most queue_size pages wait in the queue and at most
+    # queue_size more are in flight in the pool, which keeps memory flat however many URLs there are.
+    def __init__(self, fetch_page, currency, locale=None, fetchers=1, processes=PARSE_PROCESSES or None,
+                 queue_size=100):
+        self.fetch_page = fetch_page
+        self.currency = currency
+        self.locale = locale
+        self.fetchers = max(1, fetchers)
+        self.processes = processes
+        self.queue_size = queue_size
+
+    def run(self, urls, on_result=None):
+        # One entry per URL, in order: the parsed fields, or the FetchError that stopped the page.
+        # on_result(i, result) is called as soon as each one is known, from the pool's callback thread too.
+        pending = queue.Queue()
+        for item in enumerate(urls):
+            pending.put(item)
+        pages = queue.Queue(maxsize=self.queue_size)
+        results = [None] * len(urls)
+
+        def fetch():
+            while True:
+                try:
+                    i, url = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    pages.put((i, self.fetch_page(url), None))
+                except Exception as e:
+                    pages.put((i, None, classify_error(e)))
+
+        threads = [threading.Thread(target=fetch, daemon=True) for _ in range(self.fetchers)]
+        for thread in threads:
+            thread.start()
+        in_flight = threading.Semaphore(self.queue_size)
+
+        def finish(i, result):
+            results[i] = result
+            if on_result is not None:
+                on_result(i, result)
+
+        def done(future, i):
+            in_flight.release()
+            try:
+                result = future.result()
+            except Exception as e:
+                result = ParseError(f"Can't parse {urls[i]}: {e}")
+            finish(i, result)
+
+        with ProcessPoolExecutor(self.processes, mp_context=get_mp_context()) as executor:
+            for _ in range(len(urls)):
+                i, html, error = pages.get()
+                if error is not None:
+                    finish(i, error)
+                    continue
+                in_flight.acquire()
+                future = executor.submit(parse_product_page, html, self.currency, self.locale)
+                future.add_done_callback(lambda future, i=i: done(future, i))
+        for thread in threads:
+            thread.join()
+        return results
+
+
+def get_mp_context():
+    # Parser processes must not be forked from a process whose fetch threads (and Selenium, requests and
+    # logging) may be holding locks, so they start from a clean forkserver, or spawn where there is none
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def get_marketplace(url):
+    # Profile of the store a URL belongs to, None for unknown hosts
+    host = urlsplit(url).netloc
+    return next((profile for profile in MARKETPLACES.values() if urlsplit(profile['base_url']).netloc == host),
+                None)
+
+
+def reparse_store(store, prefix='', processes=PARSE_PROCESSES or None, currency=CURRENCY, batch_size=10000):
+    # Re-parses every recorded product page, e.g. after a layout change, without fetching anything.
+    # Pages are content-addressed, so a page recorded under several URLs is parsed once. Yields (url, fields).
+    groups = {}
+    for url, digest in store.get_pages(prefix):
+        if not extract_asin(url):
+            continue
+        profile = get_marketplace(url)
+        key = (digest, profile['currency'], profile['locale']) if profile else (digest, currency, None)
+        groups.setdefault(key, []).append(url)
+    keys = list(groups)
+    with ProcessPoolExecutor(processes) as executor:
+        # In batches, so millions of pages don't turn into millions of pending futures
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            parsed = executor.map(parse_object, [store.get_object_path(digest) for digest, _, _ in batch],
+                                  [currency for _, currency, _ in batch], [locale for _, _, locale in batch],
+                                  chunksize=64)
+            for key, fields in zip(batch, parsed):
+                for url in groups[key]:
+                    yield url, fields
+
+
+if __name__ == '__main__':
+    from page_store import PageStore
+
+    parser = argparse.ArgumentParser(description='Re-parse the recorded product pages on all cores')
+    parser.add_argument('--prefix', default='', help='only URLs starting with this, e.g. https://www.amazon.de/')
+    parser.add_argument('--processes', type=int, default=PARSE_PROCESSES or None)
+    parser.add_argument('--output', default='reparsed.ndjson')
+    args = parser.parse_args()
+    configure_logging()
+    store = PageStore()
+    start = time.perf_counter()
+    count = 0
+    with open(args.output, 'w') as f:
+        for url, fields in reparse_store(store, args.prefix, args.processes):
+            f.write(json.dumps(dict(fields or {}, asin=extract_asin(url), url=url)) + '\n')
+            count += 1
+    elapsed = time.perf_counter() - start
+    store.close()
+    log.info("Re-parsed %s pages in %.1fs (%.0f pages/s, %s processes)", count, elapsed, count / elapsed if elapsed
+             else 0, args.processes or os.cpu_count())
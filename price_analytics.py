@@ -0,0 +1,149 @@
+import os
+import json
+import glob
+import sqlite3
+from datetime import datetime
+import numpy as np
+from amazon_config import DIRECTORY, HISTORY_DB, ANALYTICS_DIR, BASE_URL
+from asin_index import get_canonical_url
+
+# Columnar, memory-mappable copy of the price history for fast vectorized analysis.
+# An ASIN on two stores is two products priced in two currencies, so each (store, ASIN) pair gets its own code
+# in the asin column. Rows are sorted by (code, time), so each product is one contiguous segment, and results
+# are keyed by the product's canonical URL.
+COLUMNS = ('asin', 'timestamp', 'price')
+CHUNK_SIZE = 100000
+DAY = 24 * 60 * 60
+
+
+def records_from_history(path=HISTORY_DB):
+    connection = sqlite3.connect(path)
+    try:
+        cursor = connection.execute('SELECT base_url, asin, observed_at, price, title FROM observations')
+        while True:
+            rows = cursor.fetchmany(CHUNK_SIZE)
+            if not rows:
+                break
+            for base_url, asin, observed_at, price, title in rows:
+                yield base_url, asin, datetime.strptime(observed_at, "%Y-%m-%dT%H:%M:%S").timestamp(), price, title
+    finally:
+        connection.close()
+
+
+def records_from_reports(directory=DIRECTORY):
+    # Legacy reports/*.json files, one timestamp per report
+    for path in sorted(glob.glob(f'{directory}/*.json')):
+        with open(path) as f:
+            try:
+                report = json.load(f)
+            except ValueError:
+                continue
+        if not isinstance(report, dict) or 'products' not in report:
+            continue
+        timestamp = datetime.strptime(report['date'], "%d/%m/%Y %H:%M:%S").timestamp()
+        base_url = report.get('base_link', BASE_URL)
+        for product in report['products'] or []:
+            yield base_url, product['asin'], timestamp, product['price'], product.get('title')
+
+
+def export_columns(records, path=ANALYTICS_DIR):
+    codes = {}
+    titles = []
+    chunks = {column: [] for column in COLUMNS}
+    buffer = {column: [] for column in COLUMNS}
+
+    def flush():
+        chunks['asin'].append(np.array(buffer['asin'], dtype=np.int32))
+        chunks['timestamp'].append(np.array(buffer['timestamp'], dtype=np.float64))
+        chunks['price'].append(np.array(buffer['price'], dtype=np.float64))
+        for column in COLUMNS:
+            buffer[column].clear()
+
+    for base_url, asin, timestamp, price, title in records:
+        key = (base_url, asin)
+        if key not in codes:
+            codes[key] = len(codes)
+            titles.append(title)
+        buffer['asin'].append(codes[key])
+        buffer['timestamp'].append(timestamp)
+        buffer['price'].append(price)
+        if len(buffer['asin']) >= CHUNK_SIZE:
+            flush()
+    flush()
+    columns = {column: np.concatenate(chunks[column]) for column in COLUMNS}
+    order = np.lexsort((columns['timestamp'], columns['asin']))
+    os.makedirs(path, exist_ok=True)
+    for column in COLUMNS:
+        np.save(os.path.join(path, f'{column}.npy'), columns[column][order])
+    with open(os.path.join(path, 'asins.json'), 'w') as f:
+        json.dump({'asins': [asin for _, asin in codes], 'base_urls': [base_url for base_url, _ in codes],
+                   'titles': titles}, f)
+    return len(order)
+
+
+class PriceColumns:
+    def __init__(self, path=ANALYTICS_DIR):
+        # mmap_mode keeps the columns on disk; only the pages a query touches are read
+        self.asin = np.load(os.path.join(path, 'asin.npy'), mmap_mode='r')
+        self.timestamp = np.load(os.path.join(path, 'timestamp.npy'), mmap_mode='r')
+        self.price = np.load(os.path.join(path, 'price.npy'), mmap_mode='r')
+        with open(os.path.join(path, 'asins.json')) as f:
+            index = json.load(f)
+        self.asins = index['asins']
+        self.base_urls = index.get('base_urls', [BASE_URL] * len(self.asins))
+        self.titles = index['titles']
+        self.urls = [get_canonical_url(base_url, asin) for base_url, asin in zip(self.base_urls, self.asins)]
+        # Start offset of every product's segment
+        self.starts = np.flatnonzero(np.r_[True, np.diff(self.asin) != 0]) if len(self.asin) else np.array([], int)
+        self.segment_asins = np.asarray(self.asin[self.starts])
+        self.ends = np.r_[self.starts[1:], len(self.asin)]
+
+    def __len__(self):
+        return len(self.price)
+
+    def to_rows(self, values):
+        return {self.urls[code]: value for code, value in zip(self.segment_asins, values.tolist())}
+
+    def get_series(self, asin, base_url=BASE_URL):
+        code = self.urls.index(get_canonical_url(base_url, asin))
+        segment = np.searchsorted(self.segment_asins, code)
+        start, end = self.starts[segment], self.ends[segment]
+        return np.asarray(self.timestamp[start:end]), np.asarray(self.price[start:end])
+
+    def get_stats(self):
+        counts = self.ends - self.starts
+        return {
+            'min': self.to_rows(np.minimum.reduceat(self.price, self.starts)),
+            'max': self.to_rows(np.maximum.reduceat(self.price, self.starts)),
+            'mean': self.to_rows(np.add.reduceat(self.price, self.starts) / counts),
+            'count': self.to_rows(counts)
+        }
+
+    def get_price_drops(self, min_drop=0.05):
+        # Observations where the price fell by at least min_drop against the product's previous observation
+        price = np.asarray(self.price)
+        change = np.empty_like(price)
+        change[0:1] = 0
+        change[1:] = price[1:] / price[:-1] - 1
+        change[self.starts] = 0
+        drops = np.flatnonzero(change <= -min_drop)
+        return [
+            {'asin': self.asins[self.asin[i]], 'base_url': self.base_urls[self.asin[i]],
+             'timestamp': float(self.timestamp[i]), 'price': float(price[i]),
+             'previous_price': float(price[i - 1]), 'change': float(change[i])}
+            for i in drops
+        ]
+
+    def get_change_vs_low(self, days):
+        # Latest price of each product compared with its lowest price over the last `days` days
+        last = self.ends - 1
+        since = np.repeat(np.asarray(self.timestamp[last]) - days * DAY, self.ends - self.starts)
+        window_prices = np.where(np.asarray(self.timestamp) >= since, self.price, np.inf)
+        lows = np.minimum.reduceat(window_prices, self.starts)
+        return self.to_rows(np.asarray(self.price[last]) / lows - 1)
+
+
+if __name__ == '__main__':
+    rows = export_columns(records_from_history()) if os.path.exists(HISTORY_DB) \
+        else export_columns(records_from_reports())
+    print(f"Exported {rows} price observations to {ANALYTICS_DIR}")
@@ -0,0 +1,197 @@
+import sqlite3
+from datetime import datetime, timedelta
+from amazon_config import HISTORY_DB, BASE_URL, CURRENCY
+
+try:
+    import mongoengine
+except ImportError:
+    mongoengine = None
+
+# Append-only store of every price observation, keyed by ASIN and timestamp
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def get_now():
+    return datetime.now().strftime(TIME_FORMAT)
+
+
+def get_day_bounds(day=None):
+    day = day or datetime.now()
+    start = datetime(day.year, day.month, day.day)
+    return start.strftime(TIME_FORMAT), (start + timedelta(days=1)).strftime(TIME_FORMAT)
+
+
+def to_observation(product, search_term, currency, observed_at, base_url):
+    return (
+        product['asin'],
+        observed_at,
+        product['price'],
+        product.get('title'),
+        product.get('seller'),
+        search_term,
+        currency,
+        base_url
+    )
+
+
+class PriceHistory:
+    def __init__(self, path=HISTORY_DB):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS observations (
+                asin TEXT NOT NULL,
+                observed_at TEXT NOT NULL,
+                price REAL NOT NULL,
+                title TEXT,
+                seller TEXT,
+                search_term TEXT,
+                currency TEXT,
+                base_url TEXT
+            );
+            CREATE INDEX IF NOT EXISTS observations_asin ON observations (asin, observed_at);
+            CREATE INDEX IF NOT EXISTS observations_time ON observations (observed_at, price);
+        """)
+        self.migrate()
+
+    def migrate(self):
+        # Stores written before marketplaces existed have no base_url; their rows in the configured currency
+        # are assumed to come from the configured store, others stay unattributed
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(observations)')]
+        if 'base_url' not in columns:
+            with self.connection:
+                self.connection.execute('ALTER TABLE observations ADD COLUMN base_url TEXT')
+                self.connection.execute('UPDATE observations SET base_url = ? WHERE currency = ?', (BASE_URL, CURRENCY))
+
+    def add_products(self, products, search_term, currency, observed_at=None, base_url=BASE_URL):
+        if not products:
+            return 0
+        observed_at = observed_at or get_now()
+        rows = [to_observation(product, search_term, currency, observed_at, base_url) for product in products]
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO observations (asin, observed_at, price, title, seller, search_term, currency, base_url) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows
+            )
+        return len(rows)
+
+    @staticmethod
+    def get_filter(asin, base_url):
+        # The same ASIN on two stores is two products with prices in different currencies
+        if base_url is None:
+            return 'asin = ?', [asin]
+        return 'asin = ? AND base_url = ?', [asin, base_url]
+
+    def get_price_series(self, asin, since=None, base_url=None):
+        condition, params = self.get_filter(asin, base_url)
+        query = f'SELECT observed_at, price FROM observations WHERE {condition}'
+        if since:
+            query += ' AND observed_at >= ?'
+            params.append(since)
+        return self.connection.execute(query + ' ORDER BY observed_at', params).fetchall()
+
+    def get_latest(self, asin, base_url=None):
+        condition, params = self.get_filter(asin, base_url)
+        row = self.connection.execute(
+            'SELECT asin, observed_at, price, title, seller, search_term, currency FROM observations '
+            f'WHERE {condition} ORDER BY observed_at DESC LIMIT 1', params
+        ).fetchone()
+        return dict(zip(('asin', 'observed_at', 'price', 'title', 'seller', 'search_term', 'currency'), row)) \
+            if row else None
+
+    def get_lowest_price(self, asin, base_url=None):
+        condition, params = self.get_filter(asin, base_url)
+        row = self.connection.execute(f'SELECT MIN(price) FROM observations WHERE {condition}', params).fetchone()
+        return row[0]
+
+    def get_observations_since(self, rowid=0):
+        # Rows appended after rowid, oldest first, for readers that follow the store incrementally
+        return self.connection.execute(
+            'SELECT rowid, asin, observed_at, price, title, seller, search_term, currency, base_url FROM observations '
+            'WHERE rowid > ? ORDER BY rowid', (rowid,)
+        ).fetchall()
+
+    def get_products_below(self, threshold, day=None, base_url=BASE_URL):
+        # A threshold is a price in one store's currency, so only that store's rows are compared with it
+        start, end = get_day_bounds(day)
+        return self.connection.execute(
+            'SELECT asin, MIN(price), title, seller FROM observations '
+            'WHERE observed_at >= ? AND observed_at < ? AND price <= ? AND base_url = ? '
+            'GROUP BY asin ORDER BY MIN(price)',
+            (start, end, threshold, base_url)
+        ).fetchall()
+
+    def close(self):
+        self.connection.close()
+
+
+if mongoengine:
+    class PriceObservation(mongoengine.Document):
+        asin = mongoengine.StringField(required=True)
+        observed_at = mongoengine.StringField(required=True)
+        price = mongoengine.FloatField(required=True)
+        title = mongoengine.StringField()
+        seller = mongoengine.StringField()
+        search_term = mongoengine.StringField()
+        currency = mongoengine.StringField()
+        base_url = mongoengine.StringField()
+        meta = {
+            'collection': 'observations',
+            'indexes': [('asin', 'observed_at'), ('observed_at', 'price')]
+        }
+
+
+class MongoPriceHistory:
+    # Same interface as PriceHistory, backed by MongoDB through mongoengine
+    def __init__(self, db='amazon_tracker', **connection):
+        if mongoengine is None:
+            raise ImportError("mongoengine is required for MongoPriceHistory")
+        mongoengine.connect(db, **connection)
+
+    def add_products(self, products, search_term, currency, observed_at=None, base_url=BASE_URL):
+        if not products:
+            return 0
+        observed_at = observed_at or get_now()
+        documents = [
+            PriceObservation(asin=p['asin'], observed_at=observed_at, price=p['price'], title=p.get('title'),
+                             seller=p.get('seller'), search_term=search_term, currency=currency,
+                             base_url=base_url)
+            for p in products
+        ]
+        PriceObservation.objects.insert(documents, load_bulk=False)
+        return len(documents)
+
+    @staticmethod
+    def get_observations(asin, base_url=None):
+        return PriceObservation.objects(asin=asin) if base_url is None else \
+            PriceObservation.objects(asin=asin, base_url=base_url)
+
+    def get_price_series(self, asin, since=None, base_url=None):
+        query = self.get_observations(asin, base_url)
+        if since:
+            query = query.filter(observed_at__gte=since)
+        return [(o.observed_at, o.price) for o in query.order_by('observed_at').only('observed_at', 'price')]
+
+    def get_latest(self, asin, base_url=None):
+        observation = self.get_observations(asin, base_url).order_by('-observed_at').first()
+        if observation is None:
+            return None
+        return {field: observation[field] for field in
+                ('asin', 'observed_at', 'price', 'title', 'seller', 'search_term', 'currency')}
+
+    def get_lowest_price(self, asin, base_url=None):
+        return self.get_observations(asin, base_url).min('price')
+
+    def get_products_below(self, threshold, day=None, base_url=BASE_URL):
+        start, end = get_day_bounds(day)
+        pipeline = [
+            {'$match': {'observed_at': {'$gte': start, '$lt': end}, 'price': {'$lte': threshold},
+                        'base_url': base_url}},
+            {'$group': {'_id': '$asin', 'price': {'$min': '$price'}, 'title': {'$first': '$title'},
+                        'seller': {'$first': '$seller'}}},
+            {'$sort': {'price': 1}}
+        ]
+        return [(r['_id'], r['price'], r['title'], r['seller']) for r in PriceObservation.objects.aggregate(pipeline)]
+
+    def close(self):
+        mongoengine.disconnect()
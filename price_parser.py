@@ -0,0 +1,139 @@
+import re
+
+# Locale-aware parsing of raw price strings such as '₹1,29,999.00', '1.299,00 €' or '$10 - $15'
+LOCALES = {
+    'en_IN': {'decimal': '.', 'group': ','},
+    'en_GB': {'decimal': '.', 'group': ','},
+    'en_US': {'decimal': '.', 'group': ','},
+    'ja_JP': {'decimal': '.', 'group': ','},
+    'de_DE': {'decimal': ',', 'group': '.'},
+    'it_IT': {'decimal': ',', 'group': '.'},
+    'es_ES': {'decimal': ',', 'group': '.'},
+    'nl_NL': {'decimal': ',', 'group': '.'},
+    'fr_FR': {'decimal': ',', 'group': ' '}
+}
+CURRENCY_LOCALES = {
+    '₹': 'en_IN',
+    'INR': 'en_IN',
+    '£': 'en_GB',
+    'GBP': 'en_GB',
+    '$': 'en_US',
+    'USD': 'en_US',
+    '¥': 'ja_JP',
+    'JPY': 'ja_JP',
+    '€': 'de_DE',
+    'EUR': 'de_DE'
+}
+# Symbol and ISO code of the same currency, either of which may mark a price
+CURRENCY_CODES = {'₹': 'INR', '£': 'GBP', '$': 'USD', '¥': 'JPY', '€': 'EUR'}
+CURRENCY_CODES.update({code: symbol for symbol, code in list(CURRENCY_CODES.items())})
+# A number may contain digits, separators and the spaces some locales group with
+NUMBER = re.compile("\\d[\\d.,'\u00a0\u202f ]*\\d|\\d")
+# Selenium's .text renders the '.a-price' spans as 'whole\nfraction'
+SPLIT_FRACTION = re.compile(r"(\d)\s*\n\s*(\d{2})(?!\d)")
+SPACES = re.compile("[\u00a0\u202f ']")
+# What may stand between the two ends of a range: a dash and the currency of the upper bound ('$10 - $15')
+RANGE_SEPARATOR = re.compile("[\\s\u00a0]*[-\u2013][\\s\u00a0]*[^\\d\\s]{0,3}[\\s\u00a0]*")
+
+
+def get_locale(locale=None, currency=None):
+    if locale:
+        return LOCALES[locale]
+    if currency in CURRENCY_LOCALES:
+        return LOCALES[CURRENCY_LOCALES[currency]]
+    return None
+
+
+def get_decimal(number, separators=None):
+    # The decimal separator of number, or None for a whole number
+    last = max(number.rfind('.'), number.rfind(','))
+    if last == -1:
+        return None
+    if '.' in number and ',' in number:
+        # '1,299.00' or '1.299,00': whatever the locale says, the last separator is the decimal one
+        return number[last]
+    separator = number[last]
+    if number.count(separator) > 1:
+        # '1,29,999' or '1.299.999': grouping only
+        return None
+    if separators and separator == separators['decimal']:
+        return separator
+    # A group separator is always followed by three digits, so '19.99' or '1.5' can't be grouping
+    return None if len(number) - last - 1 == 3 else separator
+
+
+def get_currency_spans(raw, currency):
+    marks = [currency] + ([CURRENCY_CODES[currency]] if currency in CURRENCY_CODES else [])
+    return [match.span() for mark in marks for match in re.finditer(re.escape(mark), raw)]
+
+
+def is_marked_before(raw, match, spans):
+    # '₹1,299': only spaces between a currency mark and the number
+    return any(end <= match.start() and not raw[end:match.start()].strip() for _, end in spans)
+
+
+def is_marked_after(raw, match, spans):
+    # '1.299,00 €'
+    return any(start >= match.end() and not raw[match.end():start].strip() for start, _ in spans)
+
+
+def to_float(number, separators):
+    number = SPACES.sub('', number)
+    decimal = get_decimal(number, separators)
+    whole, _, fraction = number.rpartition(decimal) if decimal else (number, '', '')
+    whole = re.sub(r'\D', '', whole)
+    return float(f"{whole}.{fraction}" if fraction else whole)
+
+
+def parse_price_range(raw, locale=None, currency=None):
+    # Returns (low, high); a single price gives the same value twice, unparsable input (None, None)
+    if raw is None:
+        return None, None
+    if not isinstance(raw, str):
+        return float(raw), float(raw)
+    separators = get_locale(locale, currency)
+    decimal = separators['decimal'] if separators else '.'
+    raw = SPLIT_FRACTION.sub(rf"\1{decimal}\2", raw)
+    matches = list(NUMBER.finditer(raw))
+    if currency:
+        # Like splitting on the currency: the price is the number next to its symbol or code, so '2 for ₹1,299'
+        # is 1299 and 'Save 10%' no price at all
+        spans = get_currency_spans(raw, currency)
+        start = next((i for i, match in enumerate(matches) if is_marked_before(raw, match, spans)
+                      or is_marked_after(raw, match, spans)), None)
+        if start is None:
+            return None, None
+        # '10–15 €' marks only the upper end of the range, while in 'Pack of 2 - ₹499' the 2 is no price
+        if start and not is_marked_before(raw, matches[start], spans) and \
+                RANGE_SEPARATOR.fullmatch(raw, matches[start - 1].end(), matches[start].start()):
+            start -= 1
+        matches = matches[start:]
+    matches = matches[:2]
+    # Only an explicit '-' or '–' between two numbers makes a range; '+ ₹40 Delivery' or '(₹129.90 / 100 g)'
+    # are other amounts next to the price
+    if len(matches) == 2 and not RANGE_SEPARATOR.fullmatch(raw, matches[0].end(), matches[1].start()):
+        matches = matches[:1]
+    prices = []
+    for match in matches:
+        try:
+            prices.append(to_float(match.group(), separators))
+        except ValueError:
+            pass
+    if not prices:
+        return None, None
+    return min(prices), max(prices)
+
+
+def parse_price(raw, locale=None, currency=None):
+    return parse_price_range(raw, locale, currency)[0]
+
+
+def parse_prices(raw_prices, locale=None, currency=None):
+    # Batch version for whole columns of raw strings; repeated strings are parsed once
+    parsed = {}
+    results = []
+    for raw in raw_prices:
+        if raw not in parsed:
+            parsed[raw] = parse_price(raw, locale, currency)
+        results.append(parsed[raw])
+    return results
@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from amazon_config import CACHE_FILE, STATIC_TTL, PRICE_TTL, CACHE_SIZE, BASE_URL
+from asin_index import get_canonical_url
+
+STATIC_FIELDS = ('url', 'title', 'seller')
+
+
+class ProductCache:
+    # On-disk LRU cache of scraped products keyed by their canonical URL, i.e. by store and ASIN, since the
+    # same ASIN has another price, currency and URL on every marketplace.
+    # Title/seller expire after static_ttl seconds, the price after price_ttl.
+    def __init__(self, path=CACHE_FILE, static_ttl=STATIC_TTL, price_ttl=PRICE_TTL, max_entries=CACHE_SIZE):
+        self.path = path
+        self.static_ttl = static_ttl
+        self.price_ttl = price_ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.entries = OrderedDict(json.load(f))
+
+    def is_static_fresh(self, entry, now):
+        return now - entry['static_at'] < self.static_ttl
+
+    def is_price_fresh(self, entry, now):
+        return now - entry['price_at'] < self.price_ttl
+
+    def get(self, asin, base_url=BASE_URL):
+        now = time.time()
+        key = get_canonical_url(base_url, asin)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and self.is_static_fresh(entry, now) and self.is_price_fresh(entry, now):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry['product']
+            self.misses += 1
+            return None
+
+    def get_static(self, asin, base_url=BASE_URL):
+        # Title and seller that are still fresh, so a refresh only has to read the price
+        with self.lock:
+            entry = self.entries.get(get_canonical_url(base_url, asin))
+            if entry and self.is_static_fresh(entry, time.time()):
+                return {field: entry['product'][field] for field in STATIC_FIELDS}
+            return None
+
+    def put(self, product, base_url=BASE_URL):
+        now = time.time()
+        key = get_canonical_url(base_url, product['asin'])
+        with self.lock:
+            entry = self.entries.get(key)
+            static_at = now
+            if entry and self.is_static_fresh(entry, now) and \
+                    all(entry['product'][field] == product[field] for field in STATIC_FIELDS):
+                static_at = entry['static_at']
+            self.entries[key] = {'product': product, 'static_at': static_at, 'price_at': now}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stale_asins(self, base_url=BASE_URL, asins=None):
+        # ASINs of one store that are missing or expired
+        now = time.time()
+        prefix = get_canonical_url(base_url, '')
+        with self.lock:
+            if asins is None:
+                asins = [key[len(prefix):] for key in self.entries if key.startswith(prefix)]
+            keys = [(asin, prefix + asin) for asin in asins]
+            return [asin for asin, key in keys if key not in self.entries
+                    or not self.is_price_fresh(self.entries[key], now)
+                    or not self.is_static_fresh(self.entries[key], now)]
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.entries)
+        }
+
+    def save(self):
+        with self.lock:
+            data = list(self.entries.items())
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
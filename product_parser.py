@@ -0,0 +1,99 @@
+import re
+import logging
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from price_parser import parse_price
+
+log = logging.getLogger(__name__)
+
+# Parses product pages from static HTML, mirroring the lookups AmazonAPI does on the live DOM
+PARSER = 'html.parser'
+
+
+def parse_product_page(html, currency, locale=None):
+    soup = BeautifulSoup(html, PARSER)
+    return {
+        'title': get_title(soup),
+        'seller': get_seller(soup),
+        'price': get_price(soup, currency, locale)
+    }
+
+
+def parse_product_page_safely(html, url, currency, locale=None):
+    # For backends with a browser to fall back on: a page that can't be parsed gives None instead of raising
+    try:
+        return parse_product_page(html, currency, locale)
+    except Exception as e:
+        log.warning("Can't parse %s: %s", url, e)
+        return None
+
+
+def parse_search_links(html, base_url):
+    return [result['link'] for result in parse_search_results(html, base_url, with_prices=False)]
+
+
+def parse_search_results(html, base_url, currency=None, with_prices=True):
+    # Same selection as AmazonAPI.get_products_links: product headings inside 's-main-slot'.
+    # The price comes from the result card, None when the card has none.
+    soup = BeautifulSoup(html, PARSER)
+    main_slot = soup.select_one('.s-main-slot')
+    if main_slot is None:
+        return []
+    results = []
+    for link in main_slot.select('div.a-section h2 a'):
+        if not link.get('href'):
+            continue
+        price = None
+        if with_prices:
+            card = link.find_parent('div', attrs={'data-asin': True})
+            price = get_price(card, currency) if card is not None else None
+        results.append({'link': urljoin(base_url, link['href']), 'price': price})
+    return results
+
+
+def get_text(soup, element_id):
+    element = soup.find(id=element_id)
+    if element is None:
+        return None
+    return element.get_text(strip=True) or None
+
+
+def get_title(soup):
+    return get_text(soup, 'productTitle')
+
+
+def get_seller(soup):
+    return get_text(soup, 'bylineInfo')
+
+
+def get_price(soup, currency, locale=None):
+    try:
+        price = get_text(soup, 'priceblock_ourprice')
+        if price:
+            return convert_price(price, currency, locale)
+        price_container = soup.select_one('.a-price')
+        if price_container is None:
+            return None
+        whole_price = price_container.select_one('.a-price-whole')
+        if whole_price is None:
+            return None
+        fraction = price_container.select_one('.a-price-fraction')
+        return join_price_parts(whole_price.get_text(strip=True),
+                                fraction.get_text(strip=True) if fraction is not None else None)
+    except Exception as e:
+        log.warning("Can't parse price of a product: %s", e)
+        return None
+
+
+def join_price_parts(whole_price, fraction=None):
+    # The whole part is always an integer, whatever its grouping ('24,990.', '1.299,')
+    whole_price = re.sub(r'\D', '', whole_price)
+    fraction = re.sub(r'\D', '', fraction or '')
+    return float(f"{whole_price}.{fraction}" if fraction else whole_price)
+
+
+def convert_price(price, currency, locale=None):
+    converted = parse_price(price, locale=locale, currency=currency)
+    if converted is None:
+        raise ValueError(f"Can't convert price: {price!r}")
+    return converted
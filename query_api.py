@@ -0,0 +1,235 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+from amazon_config import DIRECTORY, HISTORY_DB, API_HOST, API_PORT, API_REFRESH, API_CACHE_SIZE, BASE_URL, \
+    MARKETPLACES
+from price_history import PriceHistory
+from metrics import configure_logging
+
+log = logging.getLogger(__name__)
+
+OBSERVATION_FIELDS = ('asin', 'observed_at', 'price', 'title', 'seller', 'search_term', 'currency', 'base_url')
+QUERY_PARAMS = ('min_price', 'max_price', 'seller', 'search_term', 'sort', 'limit', 'since', 'marketplace', 'base_url')
+
+
+def load_report(path):
+    with open(path) as f:
+        try:
+            report = json.load(f)
+        except ValueError:
+            return None
+    return report if isinstance(report, dict) and 'products' in report else None
+
+
+def get_store(query, default=BASE_URL):
+    # Store picked by ?marketplace=de or ?base_url=...; an unknown marketplace is a bad request
+    if 'marketplace' in query:
+        marketplace = query['marketplace'][0]
+        if marketplace not in MARKETPLACES:
+            raise ValueError(f"Unknown marketplace {marketplace}")
+        return MARKETPLACES[marketplace]['base_url']
+    return query['base_url'][0] if 'base_url' in query else default
+
+
+def filter_products(products, query):
+    # Prices are only comparable within one store, so a store filter applies whenever one is given
+    base_url = get_store(query, None)
+    min_price = float(query['min_price'][0]) if 'min_price' in query else None
+    max_price = float(query['max_price'][0]) if 'max_price' in query else None
+    seller = query['seller'][0].lower() if 'seller' in query else None
+    search_term = query['search_term'][0] if 'search_term' in query else None
+    results = [
+        product for product in products
+        if (min_price is None or product['price'] >= min_price)
+        and (max_price is None or product['price'] <= max_price)
+        and (seller is None or seller in (product.get('seller') or '').lower())
+        and (search_term is None or product.get('search_term') == search_term)
+        and (base_url is None or product.get('base_url') == base_url)
+    ]
+    if query.get('sort', [''])[0] == 'price':
+        results.sort(key=lambda product: product['price'])
+    if 'limit' in query:
+        results = results[:int(query['limit'][0])]
+    return results
+
+
+class ProductIndex:
+    # In-memory view of reports/*.json and the price history. refresh() only re-reads report files whose
+    # mtime changed and history rows appended since the last call; every change bumps the version, which
+    # invalidates the cached response bodies and their ETags.
+    def __init__(self, directory=DIRECTORY, history=None, cache_size=API_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.directory = directory
+        self.history = history
+        self.history_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.version = 0
+        self.mtimes = {}
+        self.reports = {}
+        self.observations = {}
+        self.products = {}
+        self.last_rowid = 0
+        self.responses = OrderedDict()
+
+    def refresh(self):
+        changed = False
+        reports = dict(self.reports)
+        paths = glob.glob(f'{self.directory}/*.json')
+        for path in paths:
+            mtime = os.stat(path).st_mtime
+            if self.mtimes.get(path) == mtime:
+                continue
+            report = load_report(path)
+            self.mtimes[path] = mtime
+            if report:
+                name = os.path.splitext(os.path.basename(path))[0]
+                for product in report['products'] or []:
+                    product.setdefault('search_term', name)
+                    product.setdefault('base_url', report.get('base_link', BASE_URL))
+                reports[name] = report
+                changed = True
+        for path in set(self.mtimes) - set(paths):
+            del self.mtimes[path]
+            reports.pop(os.path.splitext(os.path.basename(path))[0], None)
+            changed = True
+        if self.history is not None:
+            with self.history_lock:
+                rows = self.history.get_observations_since(self.last_rowid)
+            if rows:
+                for row in rows:
+                    observation = dict(zip(OBSERVATION_FIELDS, row[1:]))
+                    self.observations[(observation['base_url'], observation['asin'])] = observation
+                self.last_rowid = rows[-1][0]
+                changed = True
+        if changed:
+            products = self.get_current_products(reports)
+            with self.lock:
+                self.reports = reports
+                self.products = products
+                self.version += 1
+                self.responses = OrderedDict()
+        return changed
+
+    def get_current_products(self, reports):
+        # Report products keyed by (store, ASIN), overlaid with the latest observation from the history
+        products = {}
+        for report in reports.values():
+            for product in report['products'] or []:
+                products[(product['base_url'], product['asin'])] = product
+        for key, observation in self.observations.items():
+            product = dict(products.get(key, {}))
+            product.update((field, value) for field, value in observation.items() if value is not None)
+            products[key] = product
+        return products
+
+    def run_refresher(self, interval=API_REFRESH):
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    log.warning("Index refresh failed: %s", e)
+        threading.Thread(target=loop, daemon=True).start()
+
+    def query(self, path, query):
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        if parts == ['reports']:
+            return [{'title': name, 'date': report.get('date'), 'count': len(report['products'] or [])}
+                    for name, report in sorted(self.reports.items())]
+        if len(parts) >= 2 and parts[0] == 'reports' and parts[1] in self.reports:
+            report = self.reports[parts[1]]
+            if len(parts) == 2:
+                return report
+            if parts[2:] == ['best']:
+                return report.get('best_item')
+            if parts[2:] == ['products']:
+                return filter_products(report['products'] or [], query)
+        if parts == ['products']:
+            return filter_products(list(self.products.values()), query)
+        if len(parts) >= 2 and parts[0] == 'products':
+            asin = parts[1]
+            base_url = get_store(query)
+            if len(parts) == 2:
+                return self.products.get((base_url, asin))
+            if parts[2:] == ['history'] and self.history is not None:
+                with self.history_lock:
+                    series = self.history.get_price_series(asin, query.get('since', [None])[0], base_url)
+                return [{'observed_at': observed_at, 'price': price} for observed_at, price in series] or None
+        return None
+
+    def get_response(self, target):
+        # Returns (etag, body) for a request target, or None when there is nothing there
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        # Cached under the path and the known parameters only, in a bounded LRU
+        key = (url.path.rstrip('/'), tuple((param, tuple(query[param])) for param in QUERY_PARAMS if param in query))
+        responses = self.responses
+        with self.lock:
+            if key in responses:
+                responses.move_to_end(key)
+                return responses[key]
+        data = self.query(url.path, query)
+        if data is None:
+            return None
+        body = json.dumps(data).encode()
+        response = ('"%s"' % hashlib.sha1(body).hexdigest()[:20], body)
+        with self.lock:
+            responses[key] = response
+            if len(responses) > self.cache_size:
+                responses.popitem(last=False)
+        return response
+
+
+def serve(index, host=API_HOST, port=API_PORT):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            try:
+                response = index.get_response(self.path)
+            except ValueError:
+                self.send_error(400)
+                return
+            if response is None:
+                self.send_error(404)
+                return
+            etag, body = response
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    configure_logging()
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else API_PORT
+    index = ProductIndex(history=PriceHistory(HISTORY_DB) if os.path.exists(HISTORY_DB) else None)
+    index.refresh()
+    index.run_refresher()
+    log.info("Serving %s reports on http://%s:%s", len(index.reports), API_HOST, port)
+    serve(index, port=port).serve_forever()
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from collections import deque
+from amazon_config import (
+    BACKOFF_BASE,
+    BACKOFF_MAX,
+    BREAKER_WINDOW,
+    BREAKER_THRESHOLD,
+    BREAKER_COOLDOWN,
+    DEAD_LETTER_FILE
+)
+
+log = logging.getLogger(__name__)
+
+# Markers of Amazon's robot check page
+CAPTCHA_MARKERS = (
+    '/errors/validateCaptcha',
+    'Enter the characters you see below',
+    "Sorry, we just need to make sure you're not a robot",
+    'Type the characters you see in this image'
+)
+
+
+class FetchError(Exception):
+    kind = 'fetch'
+    retryable = True
+    # Counted by the circuit breaker as a sign that Amazon is blocking us
+    blocking = False
+
+
+class FetchTimeout(FetchError):
+    kind = 'timeout'
+    blocking = True
+
+
+class CaptchaError(FetchError):
+    kind = 'captcha'
+    blocking = True
+
+
+class MissingElementError(FetchError):
+    kind = 'missing_element'
+    retryable = False
+
+
+class ParseError(FetchError):
+    kind = 'parse'
+    retryable = False
+
+
+def is_captcha(page):
+    return bool(page) and any(marker in page for marker in CAPTCHA_MARKERS)
+
+
+def classify_error(error):
+    # Maps requests/Selenium exceptions onto the FetchError kinds above
+    if isinstance(error, FetchError):
+        return error
+    name = type(error).__name__
+    if 'Timeout' in name:
+        return FetchTimeout(str(error))
+    if name in ('NoSuchElementException', 'StaleElementReferenceException'):
+        return MissingElementError(str(error))
+    if isinstance(error, (ValueError, KeyError, TypeError, IndexError)):
+        return ParseError(str(error))
+    return FetchError(f"{name}: {error}")
+
+
+class CircuitBreaker:
+    # Opens when the share of blocking failures (timeouts, captchas) in the last `window` fetches
+    # reaches `threshold`, then pauses every fetch for `cooldown` seconds before trying again
+    def __init__(self, window=BREAKER_WINDOW, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN,
+                 sleep=time.sleep):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.sleep = sleep
+        self.outcomes = deque(maxlen=window)
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def get_block_rate(self):
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def before_call(self):
+        with self.lock:
+            remaining = self.opened_at + self.cooldown - time.monotonic() if self.opened_at else 0
+        if remaining > 0:
+            log.warning("Circuit open, pausing fetches for %.0f seconds", remaining)
+            self.sleep(remaining)
+
+    def record(self, blocked):
+        with self.lock:
+            self.outcomes.append(1 if blocked else 0)
+            if self.opened_at and not blocked:
+                # First success after the pause closes the circuit again
+                self.opened_at = None
+                self.outcomes.clear()
+            elif len(self.outcomes) == self.outcomes.maxlen and self.get_block_rate() >= self.threshold:
+                self.opened_at = time.monotonic()
+                self.outcomes.clear()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None and time.monotonic() < self.opened_at + self.cooldown
+
+
+def get_backoff(attempt, base=BACKOFF_BASE, maximum=BACKOFF_MAX):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+def retry_with_backoff(func, retries, breaker=None, sleep=time.sleep):
+    attempt = 0
+    while True:
+        if breaker:
+            breaker.before_call()
+        try:
+            result = func()
+        except Exception as e:
+            error = classify_error(e)
+            if breaker:
+                breaker.record(error.blocking)
+            if not error.retryable or attempt >= retries:
+                raise error from e
+            delay = get_backoff(attempt)
+            log.info("Retrying after %s error in %.1f seconds", error.kind, delay)
+            sleep(delay)
+            attempt += 1
+            continue
+        if breaker:
+            breaker.record(False)
+        return result
+
+
+class DeadLetterList:
+    # ASINs whose fetch failed for good, kept on disk for a targeted re-fetch
+    def __init__(self, path=DEAD_LETTER_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def add(self, asin, error):
+        with self.lock:
+            entry = self.entries.get(asin, {'attempts': 0})
+            entry.update({'error': error.kind, 'message': str(error)[:200], 'attempts': entry['attempts'] + 1,
+                          'failed_at': time.time()})
+            self.entries[asin] = entry
+
+    def remove(self, asin):
+        with self.lock:
+            self.entries.pop(asin, None)
+
+    def get_asins(self, kinds=None):
+        with self.lock:
+            return [asin for asin, entry in self.entries.items() if kinds is None or entry['error'] in kinds]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def save(self):
+        with self.lock:
+            with open(self.path, 'w') as f:
+                json.dump(self.entries, f)
@@ -0,0 +1,57 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from http_backend import get_search_url
+from product_parser import parse_search_results
+
+log = logging.getLogger(__name__)
+
+
+class SearchCrawler:
+    # Follows search result pages, fetching the next page while the current one is parsed.
+    # Stops at max_pages/max_items, or once a page brings no new ASINs or nothing inside the filters.
+    def __init__(self, fetch_page, get_asin, base_url, currency, max_pages=5, max_items=None):
+        self.fetch_page = fetch_page
+        self.get_asin = get_asin
+        self.base_url = base_url
+        self.currency = currency
+        self.max_pages = max_pages
+        self.max_items = max_items
+
+    @staticmethod
+    def in_filters(price, filters):
+        # Cards without a price can't be ruled out here
+        return price is None or float(filters['min']) <= price <= float(filters['max'])
+
+    def crawl(self, search_term, filters):
+        links = []
+        seen = set()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self.fetch_page, get_search_url(self.base_url, search_term, filters))
+            for page in range(1, self.max_pages + 1):
+                try:
+                    html = future.result()
+                except Exception as e:
+                    log.warning("Couldn't load search page %s: %s", page, e)
+                    break
+                future = None
+                if page < self.max_pages:
+                    future = executor.submit(self.fetch_page,
+                                             get_search_url(self.base_url, search_term, filters, page + 1))
+                results = parse_search_results(html, self.base_url, self.currency)
+                new = []
+                for result in results:
+                    asin = self.get_asin(result['link'])
+                    if asin and asin not in seen:
+                        seen.add(asin)
+                        new.append(result)
+                matching = [result for result in new if self.in_filters(result['price'], filters)]
+                log.info("Page %s: %s results, %s new, %s within filters", page, len(results), len(new), len(matching))
+                links.extend(result['link'] for result in matching)
+                if not matching:
+                    break
+                if self.max_items and len(links) >= self.max_items:
+                    links = links[:self.max_items]
+                    break
+            if future:
+                future.cancel()
+        return links
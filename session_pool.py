@@ -0,0 +1,142 @@
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from amazon_config import SESSION_MAX_PAGE_LOADS, SESSION_MAX_MEMORY_MB
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+log = logging.getLogger(__name__)
+
+
+class PooledSession:
+    # Wraps a WebDriver and counts page loads; everything else is passed through
+    def __init__(self, driver):
+        self.driver = driver
+        self.page_loads = 0
+
+    def get(self, url):
+        self.page_loads += 1
+        return self.driver.get(url)
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    def get_memory_mb(self):
+        # Resident memory of chromedriver and the Chrome processes it started; needs psutil
+        if psutil is None:
+            return None
+        try:
+            process = psutil.Process(self.driver.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+        except (AttributeError, psutil.Error):
+            return None
+
+
+class SessionPool:
+    # Keeps up to `size` browser sessions warm and recycles each one after max_page_loads
+    # page loads or once it grows past max_memory_mb. create_driver starts one session, e.g.
+    # AmazonAPI.create_headless_driver with the run's Chrome profile.
+    def __init__(self, size, create_driver, max_page_loads=SESSION_MAX_PAGE_LOADS,
+                 max_memory_mb=SESSION_MAX_MEMORY_MB):
+        self.size = size
+        self.create_driver = create_driver
+        self.max_page_loads = max_page_loads
+        self.max_memory_mb = max_memory_mb
+        self.idle = deque()
+        # Signalled whenever a session goes back to idle or a slot frees up
+        self.lock = threading.Condition()
+        self.open_sessions = 0
+        self.recycled = 0
+
+    def warm_up(self):
+        with self.lock:
+            missing = self.size - self.open_sessions
+            self.open_sessions += missing
+        if missing <= 0:
+            return
+        with ThreadPoolExecutor(max_workers=missing) as executor:
+            for driver in executor.map(lambda _: self.new_driver(), range(missing)):
+                if driver:
+                    self.put_idle(PooledSession(driver))
+                else:
+                    self.discard_slot()
+
+    def new_driver(self):
+        try:
+            return self.create_driver()
+        except Exception as e:
+            log.warning("Couldn't start a browser session: %s", e)
+            return None
+
+    def discard_slot(self):
+        with self.lock:
+            self.open_sessions -= 1
+            self.lock.notify()
+
+    def put_idle(self, session):
+        with self.lock:
+            self.idle.append(session)
+            self.lock.notify()
+
+    def acquire(self):
+        # An idle session, else a new one while there is room, else wait for either
+        with self.lock:
+            while not self.idle and self.open_sessions >= self.size:
+                self.lock.wait()
+            if self.idle:
+                return self.idle.popleft()
+            self.open_sessions += 1
+        try:
+            return PooledSession(self.create_driver())
+        except Exception:
+            self.discard_slot()
+            raise
+
+    def is_worn_out(self, session):
+        if self.max_page_loads and session.page_loads >= self.max_page_loads:
+            return True
+        if self.max_memory_mb:
+            memory = session.get_memory_mb()
+            return memory is not None and memory > self.max_memory_mb
+        return False
+
+    def release(self, session, broken=False):
+        if broken or self.is_worn_out(session):
+            self.recycled += 1
+            self.quit_session(session)
+            self.discard_slot()
+        else:
+            self.put_idle(session)
+
+    @contextmanager
+    def session(self):
+        session = self.acquire()
+        broken = False
+        try:
+            yield session
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(session, broken)
+
+    @staticmethod
+    def quit_session(session):
+        try:
+            session.driver.quit()
+        except Exception as e:
+            log.warning("Couldn't quit a browser session: %s", e)
+
+    def close(self):
+        with self.lock:
+            sessions = list(self.idle)
+            self.idle.clear()
+        for session in sessions:
+            self.quit_session(session)
+            self.discard_slot()
@@ -1,4 +1,10 @@
+import os
+import sys
 import time
+import argparse
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -8,554 +14,635 @@ from amazon_config import (
     get_chrome_web_driver,
     set_ignore_certificate_error,
     set_browser_as_incognito,
+    set_automation_as_head_less,
+    set_fast_scrape_profile,
+    block_resources,
     NAME,
     CURRENCY,
     FILTERS,
     BASE_URL,
-    DIRECTORY
+    DIRECTORY,
+    WORKERS,
+    BACKEND,
+    MAX_PAGES,
+    MAX_ITEMS,
+    DIFF_MODE,
+    FAST_SCRAPE,
+    PAGE_WAIT,
+    METRICS_FILE,
+    METRICS_PORT,
+    RETRIES,
+    PAGE_STORE_DIR,
+    LANGUAGE,
+    LOCALE,
+    PARSE_PROCESSES,
+    DEAD_LETTER_FILE,
+    REPLAY_DIR
 )
-from selenium.common.exceptions import NoSuchElementException
-import json
-from datetime import datetime
+from http_backend import HttpBackend
+from product_parser import convert_price, join_price_parts
+from price_history import PriceHistory
+from product_cache import ProductCache
+from search_crawler import SearchCrawler
+from change_detector import ChangeDetector
+from streaming_report import StreamingReport
+from session_pool import SessionPool
+from checkpoint import CheckpointJournal
+from asin_index import AsinIndex, extract_asin, get_canonical_url
+from alerts import AlertEngine
+from page_store import PageStore, RecordingBackend, ReplayBackend
+from parse_pipeline import ParsePipeline
+from metrics import metrics, configure_logging
+from resilience import (
+    CircuitBreaker,
+    DeadLetterList,
+    CaptchaError,
+    MissingElementError,
+    ParseError,
+    FetchError,
+    is_captcha,
+    retry_with_backoff
+)
+from selenium.common.exceptions import TimeoutException
+
+log = logging.getLogger(__name__)
+
+# Reads every product field in one WebDriver round trip instead of one per find_element
+EXTRACT_PRODUCT_SCRIPT = """
+const text = (element) => element ? element.innerText.trim() : null;
+const priceContainer = document.querySelector('.a-price');
+return {
+    title: text(document.getElementById('productTitle')),
+    seller: text(document.getElementById('bylineInfo')),
+    price_block: text(document.getElementById('priceblock_ourprice')),
+    price_whole: priceContainer ? text(priceContainer.querySelector('.a-price-whole')) : null,
+    price_fraction: priceContainer ? text(priceContainer.querySelector('.a-price-fraction')) : null,
+    availability: text(document.getElementById('availability')),
+    offer_price: text(document.querySelector('.olp-padding-right')),
+    captcha: !!document.querySelector('form[action*="validateCaptcha"]')
+};
+"""
 
 
 class GenerateReport:
-    def __init__(self, file_name, filters, base_link, currency, data):
+    def __init__(self, file_name, filters, base_link, currency, data, history=None, detector=None,
+                 directory=DIRECTORY, alerts=None, failed=(), search_term=None):
         self.data = data
+        # The history and alerts see the search term, which differs from the file name for per-store reports
+        self.search_term = search_term or file_name
+        self.directory = directory
         self.file_name = file_name
         self.filters = filters
         self.base_link = base_link
         self.currency = currency
-        report = {
-            'title': self.file_name,
-            'date': self.get_now(),
-            'best_item': self.get_best_item(),
-            'currency': self.currency,
-            'filters': self.filters,
-            'base_link': self.base_link,
-            'products': self.data
-        }
-        print("Creating report...")
-        with open(f'{DIRECTORY}/{file_name}.json', 'w') as f:
-            json.dump(report, f)
-        print("Done...")
-
-    @staticmethod
-    def get_now():
-        now = datetime.now()
-        return now.strftime("%d/%m/%Y %H:%M:%S")
-
-    def get_best_item(self):
-        try:
-            return sorted(self.data, key=lambda k: k['price'])[0]
-        except Exception as e:
-            print(e)
-            print("Problem with sorting items")
-            return None
+        if alerts:
+            alerts.check(self.data, self.search_term, self.base_link)
+        if history:
+            count = history.add_products(self.data, self.search_term, self.currency, base_url=self.base_link)
+            log.info("Saved %s price observations to history", count)
+        # In diff mode only the delta is logged, with a full report every few runs
+        if detector is None or detector.record(self.data, failed):
+            self.write_report()
+        log.info("Done...")
+
+    def write_report(self):
+        # Streamed product by product, with the best item picked on the way instead of in a second pass
+        log.info("Creating report...")
+        with metrics.timer('stage_seconds', stage='report'):
+            with StreamingReport(self.file_name, self.filters, self.base_link, self.currency,
+                                 directory=self.directory) as report:
+                for product in self.data or []:
+                    report.write(product)
 
 
 class AmazonAPI:
-    def __init__(self, search_term, filters, base_url, currency):
-        self.base_url = base_url
+    def __init__(self, search_term, filters, base_url, currency, workers=1, driver=None, backend='selenium',
+                 http_backend=None, cache=None, max_pages=1, max_items=None, session_pool=None,
+                 fast_scrape=False, retries=0, breaker=None, dead_letters=None,
+                 journal=None, asin_index=None, page_store=None, language=LANGUAGE, locale=None,
+                 parse_processes=0):
+        self.workers = max(1, workers)
+        self.closed = False
+        # With parse_processes, pages are fetched as raw HTML and parsed in a process pool (see ParsePipeline)
+        self.parse_processes = parse_processes
+        self.retries = retries
+        # Shared with worker clones so the block rate and failures are tracked across all sessions
+        self.breaker = breaker
+        self.dead_letters = dead_letters
+        self.journal = journal
+        self.asin_index = asin_index
+        self.fast_scrape = fast_scrape
+        self.max_pages = max_pages
+        self.max_items = max_items
+        # Pages are recorded to page_store as they are fetched, or served from it with the 'replay' backend
+        self.page_store = page_store
+        # Sessions handed in from outside (e.g. worker sessions) are not ours to quit. Replays need no browser.
+        # Our own browser only starts on first use (see driver), so HTTP runs may never start Chrome at all.
+        self.owns_driver = driver is None and backend != 'replay'
+        self._driver = driver
+        self.driver_lock = threading.Lock()
+        # Held while the main browser serves a fallback for one of the HTTP fetch threads
+        self.fallback_lock = threading.Lock()
+        # Extra browser sessions used by parallel fetching, kept warm and recycled by the pool until quit()
+        self.owns_session_pool = session_pool is None and self.workers > 1 and backend != 'replay'
+        self.session_pool = SessionPool(self.workers - 1, create_driver=self.create_headless_driver) \
+            if self.owns_session_pool else session_pool
+        if self.owns_session_pool and backend == 'selenium':
+            # Every worker needs a browser, so they all start now, in parallel. Over HTTP they are only a
+            # fallback and start on demand.
+            self.session_pool.warm_up()
+        # With the 'http' backend product pages are fetched without Chrome; Selenium stays as fallback
+        self.backend = backend
+        self.owns_http_backend = backend in ('http', 'replay') and http_backend is None
+        self.http_backend = self.create_http_backend() if self.owns_http_backend else http_backend
+        self.cache = cache
+        self.set_query(search_term, filters, currency=currency, base_url=base_url, language=language, locale=locale)
+
+    def set_query(self, search_term, filters, currency=None, base_url=None, language=None, locale=None):
+        # Point this instance (and its warm sessions) at another search, possibly on another marketplace.
+        # Without a locale, prices are parsed with the usual locale of the currency.
         self.search_term = search_term
-        options = get_web_driver_options()
-        set_ignore_certificate_error(options)
-        set_browser_as_incognito(options)
-        self.driver = get_chrome_web_driver(options)
-        self.currency = currency
+        self.filters = filters
+        self.currency = currency or self.currency
+        self.base_url = base_url or self.base_url
+        self.language = language or self.language
+        self.locale = locale
         self.price_filter = f"&low-price={filters['min']}&high-price={filters['max']}"
-        print(f"Initialized with search term: {self.search_term}, min price: {filters['min']}, max price: {filters['max']}")
+        # Debug only: worker clones pass through here once per product fetched on a pooled session
+        log.debug("Initialized with search term: %s, min price: %s, max price: %s",
+                  self.search_term, filters['min'], filters['max'])
 
     def run(self):
-        print("Starting Script...")
-        print(f"Looking for {self.search_term} products...")
-        links = self.get_products_links()
-        if not links:
-            print("Stopped script.")
-            return
-        print(f"Got {len(links)} links to products...")
-        print("Getting info about products...")
-        products = self.get_products_info(links)
-        print(f"Got info about {len(products)} products...")
-        self.driver.quit()
-        return products
-
-    def get_products_links(self):
-        self.driver.get(self.base_url)
-        print(f"Navigated to base URL: {self.base_url}")
-        element = WebDriverWait(self.driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, '//*[@id="twotabsearchtextbox"]'))
-        )
-        element.send_keys(self.search_term)
-        element.send_keys(Keys.ENTER)
-        print(f"Entered search term: {self.search_term}")
-
-        # Wait for the results to load
-        WebDriverWait(self.driver, 10).until(
-            EC.presence_of_element_located((By.CLASS_NAME, 's-main-slot'))
-        )
-        print("Waited for search results to load")
-
-        # Get the current URL with the price filter
-        url_with_filter = f"{self.driver.current_url}{self.price_filter}"
-        self.driver.get(url_with_filter)
-        print(f"Navigated to URL with price filter: {url_with_filter}")
-
-        # Find the product links by locating divs with class 'a-section' inside 's-main-slot'
-        result_list = self.driver.find_elements(By.CLASS_NAME, 's-main-slot')
-        links = []
+        # Browser sessions are closed however the run ends
         try:
-            # Find all divs with class 'a-section' within the first 's-main-slot'
-            a_section_divs = result_list[0].find_elements(By.CSS_SELECTOR, "div.a-section")
-            
-            # Iterate through each 'a-section' div to find the product links
-            for div in a_section_divs:
-                # Find all <a> elements within each 'a-section' div
-                anchors = div.find_elements(By.TAG_NAME, "a")
-                for link in anchors:
-                    href = link.get_attribute('href')
-                    if href:  # Ensure the href is not None
-                        links.append(href)
-
-            print(f"Found {len(links)} product links")
-            return links
-        except Exception as e:
-            print("Didn't get any products...")
-            print(e)
-            return links
-
-    def get_products_info(self, links):
-        asins = self.get_asins(links)
-        products = []
-        for asin in asins:
-            product = self.get_single_product_info(asin)
-            if product:
-                products.append(product)
-        return products
-
-    def get_asins(self, links):
-        return [self.get_asin(link) for link in links]
-
-    def get_single_product_info(self, asin):
-        print(f"Product ID: {asin} - getting data...")
-        product_short_url = self.shorten_url(asin)
-        print(f"Product URL: {product_short_url}")
-        try:
-            self.driver.get(f'{product_short_url}?language=en_GB')
-            print(f"Navigated to product URL: {product_short_url}")
-            title = self.get_title()
-            seller = self.get_seller()
-            price = self.get_price()
-            if title and seller and price:
-                product_info = {
-                    'asin': asin,
-                    'url': product_short_url,
-                    'title': title,
-                    'seller': seller,
-                    'price': price
-                }
-                print(f"Got product info: {product_info}")
-                return product_info
-        except Exception as e:
-            print(f"Error accessing product URL: {product_short_url}")
-            print(e)
-        return None
-
-    def get_title(self):
-        try:
-            title = self.driver.find_element(By.ID, 'productTitle').text
-            print(f"Got product title: {title.trim()}")
-            return title
-        except Exception as e:
-            print(e)
-            print(f"Can't get title of a product - {self.driver.current_url}")
-            return None
-
-    def get_seller(self):
-        try:
-            seller = self.driver.find_element(By.ID, 'bylineInfo').text
-            print(f"Got product seller: {seller.trim()}")
-            return seller
-        except Exception as e:
-            print(e)
-            print(f"Can't get seller of a product - {self.driver.current_url}")
-            return None
-        
-    def get_price(self):
-        price = None
-        try:
-            # Locate the main price container
-            price_container = self.driver.find_element(By.CLASS_NAME, 'a-price')
-            
-            # Find the span with class 'a-price-whole'
-            whole_price_span = price_container.find_element(By.CLASS_NAME, 'a-price-whole')
-            whole_price = whole_price_span.text  # Extract the text from the span
-            print(f"Whole price extracted: {whole_price}")
-
-            # Find the span with class 'a-price-decimal' if it exists
-            try:
-                decimal_price_span = price_container.find_element(By.CLASS_NAME, 'a-price-decimal')
-                decimal_price = decimal_price_span.text
-                price = f"{whole_price}{decimal_price}"  # Combine whole and decimal parts
-                print(f"Decimal price extracted: {decimal_price}")
-            except NoSuchElementException:
-                price = whole_price  # If no decimal part, just use the whole price
-
-            # Clean up the price string
-            price = price.replace(',', '').strip()  # Remove commas and whitespace
-            print(f"Final price string: {price}")
-            
-            # Convert the price to a float if necessary
-            price = float(price)  # Convert to float
-            return price
-        except NoSuchElementException:
-            print(f"Price element not found - {self.driver.current_url}")
-            return None
-        except Exception as e:
-            print(e)
-            print(f"Can't get price of a product - {self.driver.current_url}")
+            return self.collect_products()
+        finally:
+            self.quit()
+
+    def collect_products(self):
+        log.info("Starting Script...")
+        log.info("Looking for %s products...", self.search_term)
+        if self.journal and self.journal.links:
+            links = self.journal.links
+            log.info("Resuming with %s products already done...", len(self.journal.products))
+        else:
+            with metrics.timer('stage_seconds', stage='search'):
+                links = self.get_products_links()
+            if self.journal and links:
+                self.journal.record_links(links)
+        if not links:
+            log.warning("Stopped script.")
             return None
+        log.info("Got %s links to products...", len(links))
+        log.info("Getting info about products...")
+        with metrics.timer('stage_seconds', stage='products'):
+            products = self.get_products_info(links)
+        log.info("Got info about %s products...", len(products))
+        return products
 
-    @staticmethod
-    def get_asin(product_link):
-        return product_link[product_link.find('/dp/') + 4:product_link.find('/ref')]
+    @property
+    def driver(self):
+        with self.driver_lock:
+            if self._driver is None and self.owns_driver and not self.closed:
+                self._driver = self.create_driver()
+        return self._driver
 
-    def shorten_url(self, asin):
-        return self.base_url + 'dp/' + asin
+    def has_browser(self):
+        return self._driver is not None or (self.owns_driver and not self.closed)
 
-    def convert_price(self, price):
-        price = price.split(self.currency)[1]
-        try:
-            price = price.split("\n")[0] + "." + price.split("\n")[1]
-        except:
-            pass
-        try:
-            price = price.split(",")[0] + price.split(",")[1]
-        except:
-            pass
-        return float(price)
-    def __init__(self, search_term, filters, base_url, currency):
-        self.base_url = base_url
-        self.search_term = search_term
+    def create_driver(self, headless=False):
         options = get_web_driver_options()
         set_ignore_certificate_error(options)
         set_browser_as_incognito(options)
-        self.driver = get_chrome_web_driver(options)
-        self.currency = currency
-        self.price_filter = f"&low-price={filters['min']}&high-price={filters['max']}"
-        print(f"Initialized with search term: {self.search_term}, min price: {filters['min']}, max price: {filters['max']}")
-
-    def run(self):
-        print("Starting Script...")
-        print(f"Looking for {self.search_term} products...")
-        links = self.get_products_links()
-        if not links:
-            print("Stopped script.")
+        if headless:
+            set_automation_as_head_less(options)
+        if self.fast_scrape:
+            set_fast_scrape_profile(options)
+        driver = get_chrome_web_driver(options)
+        if self.fast_scrape:
+            block_resources(driver)
+        return driver
+
+    def create_http_backend(self):
+        if self.backend == 'replay':
+            return ReplayBackend(self.page_store)
+        backend = HttpBackend(pool_size=self.workers)
+        return RecordingBackend(backend, self.page_store) if self.page_store is not None else backend
+
+    def create_headless_driver(self):
+        # Worker sessions are never looked at, so they run without a window
+        return self.create_driver(headless=True)
+
+    def quit(self):
+        # Safe to call more than once
+        if self.closed:
             return
-        print(f"Got {len(links)} links to products...")
-        print("Getting info about products...")
-        products = self.get_products_info(links)
-        print(f"Got info about {len(products)} products...")
-        self.driver.quit()
-        return products
+        self.closed = True
+        if self.owns_session_pool:
+            self.session_pool.close()
+        if self.owns_driver and self._driver is not None:
+            self._driver.quit()
+        if self.owns_http_backend:
+            self.http_backend.close()
 
     def get_products_links(self):
+        # Recorded runs search by URL so that replays can look the search pages up again
+        if self.max_pages > 1 or self.page_store is not None:
+            return self.crawl_products_links()
         self.driver.get(self.base_url)
-        print(f"Navigated to base URL: {self.base_url}")
+        log.info("Navigated to base URL: %s", self.base_url)
         element = WebDriverWait(self.driver, 10).until(
             EC.presence_of_element_located((By.XPATH, '//*[@id="twotabsearchtextbox"]'))
         )
         element.send_keys(self.search_term)
         element.send_keys(Keys.ENTER)
-        print(f"Entered search term: {self.search_term}")
+        log.info("Entered search term: %s", self.search_term)
 
         # Wait for the results to load
-        WebDriverWait(self.driver, 10).until(
-            EC.presence_of_element_located((By.CLASS_NAME, 's-main-slot'))
-        )
-        print("Waited for search results to load")
+        with metrics.timer('stage_seconds', stage='search_wait'):
+            WebDriverWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.CLASS_NAME, 's-main-slot'))
+            )
+        log.info("Waited for search results to load")
 
         # Get the current URL with the price filter
         url_with_filter = f"{self.driver.current_url}{self.price_filter}"
         self.driver.get(url_with_filter)
-        print(f"Navigated to URL with price filter: {url_with_filter}")
+        log.info("Navigated to URL with price filter: %s", url_with_filter)
 
-        # Find the product links starting from the third div with class 's-result-item'
+        # Find the product links
         result_list = self.driver.find_elements(By.CLASS_NAME, 's-main-slot')
+     
         links = []
         try:
-            # Use CSS selectors to find h2 elements inside divs with class 's-result-item' starting from the third one
-            results = result_list[0].find_elements(By.CSS_SELECTOR, "div.s-result-item:nth-of-type(n+3) h2 a")
+            results = result_list[0].find_elements(By.CSS_SELECTOR, "div.a-section h2 a")
             links = [link.get_attribute('href') for link in results]
-            print(f"Found {len(links)} product links")
+            log.info("Found %s product links", len(links))
             return links
         except Exception as e:
-            print("Didn't get any products...")
-            print(e)
+            log.warning("Didn't get any products...")
+            log.warning("%s", e)
             return links
 
+    def crawl_products_links(self):
+        crawler = SearchCrawler(self.get_page_source, self.get_asin, self.base_url, self.currency,
+                                max_pages=self.max_pages, max_items=self.max_items)
+        links = crawler.crawl(self.search_term, self.filters)
+        log.info("Found %s product links", len(links))
+        return links
+
+    def get_page_source(self, url, product=False):
+        if self.http_backend:
+            return self.http_backend.get_page(url)
+        self.driver.get(url)
+        if product and self.fast_scrape:
+            # Eager loads return early, so product pages are read (and recorded) once the nodes exist
+            with metrics.timer('stage_seconds', stage='wait_for_nodes'):
+                self.wait_for_product_nodes()
+        page = self.driver.page_source
+        if self.page_store is not None:
+            self.page_store.put(url, page)
+        return page
+
     def get_products_info(self, links):
         asins = self.get_asins(links)
-        products = []
-        for asin in asins:
-            product = self.get_single_product_info(asin)
-            if product:
-                products.append(product)
+        return [product for product in self.fetch_products(asins) if product]
+
+    def fetch_products(self, asins):
+        # Returns one entry per ASIN, None where the product couldn't be scraped
+        products = [self.journal.get(asin) for asin in asins] if self.journal else [None] * len(asins)
+        if self.cache:
+            products = [product or self.cache.get(asin, self.base_url) for asin, product in zip(asins, products)]
+        missing = [i for i, product in enumerate(products) if product is None]
+        if self.cache:
+            log.info("Cache: %s fresh products, %s to fetch...", len(asins) - len(missing), len(missing))
+        missing_asins = [asins[i] for i in missing]
+        if self.parse_processes and missing_asins:
+            fetched = self.get_products_info_split(missing_asins)
+        elif self.workers > 1:
+            fetched = self.get_products_info_parallel(missing_asins)
+        else:
+            fetched = [self.get_single_product_info(asin) for asin in missing_asins]
+        for i, product in zip(missing, fetched):
+            products[i] = product
+            if product and self.cache:
+                self.cache.put(product, self.base_url)
         return products
 
-    def get_asins(self, links):
-        return [self.get_asin(link) for link in links]
+    def refresh_stale(self):
+        # Re-fetch only cached products whose price or static fields have expired
+        if not self.cache:
+            return []
+        asins = self.cache.stale_asins(self.base_url)
+        log.info("Refreshing %s stale products...", len(asins))
+        return [product for product in self.fetch_products(asins) if product]
 
-    def get_single_product_info(self, asin):
-        print(f"Product ID: {asin} - getting data...")
-        product_short_url = self.shorten_url(asin)
-        print(f"Product URL: {product_short_url}")
-        try:
-            self.driver.get(f'{product_short_url}?language=en_GB')
-            print(f"Navigated to product URL: {product_short_url}")
-            title = self.get_title()
-            seller = self.get_seller()
-            price = self.get_price()
-            if title and seller and price:
-                product_info = {
-                    'asin': asin,
-                    'url': product_short_url,
-                    'title': title,
-                    'seller': seller,
-                    'price': price
-                }
-                print(f"Got product info: {product_info}")
-                return product_info
-        except Exception as e:
-            print(f"Error accessing product URL: {product_short_url}")
-            print(e)
-        return None
+    def get_products_info_parallel(self, asins):
+        log.info("Fetching %s products with %s workers...", len(asins), self.workers)
+        # The main driver takes part as one worker, the other threads borrow pooled sessions
+        main_driver = threading.Lock()
 
-    def get_title(self):
-        try:
-            title = self.driver.find_element(By.ID, 'productTitle').text
-            print(f"Got product title: {title}")
-            return title
-        except Exception as e:
-            print(e)
-            print(f"Can't get title of a product - {self.driver.current_url}")
-            return None
-
-    def get_seller(self):
-        try:
-            seller = self.driver.find_element(By.ID, 'bylineInfo').text
-            print(f"Got product seller: {seller}")
-            return seller
-        except Exception as e:
-            print(e)
-            print(f"Can't get seller of a product - {self.driver.current_url}")
-            return None
-
-    def get_price(self):
-        price = None
-        try:
-            price = self.driver.find_element(By.ID, 'priceblock_ourprice').text
-            price = self.convert_price(price)
-            print(f"Got product price: {price}")
-        except NoSuchElementException:
+        def fetch(asin):
             try:
-                availability = self.driver.find_element(By.ID, 'availability').text
-                if 'Available' in availability:
-                    price = self.driver.find_element(By.CLASS_NAME, 'olp-padding-right').text
-                    price = price[price.find(self.currency):]
-                    price = self.convert_price(price)
-                    print(f"Got product price: {price}")
+                # Over HTTP every thread fetches on its own; browsers are only borrowed to fall back (load_product)
+                if self.session_pool is None or self.http_backend:
+                    return self.get_single_product_info(asin)
+                if main_driver.acquire(blocking=False):
+                    try:
+                        return self.get_single_product_info(asin)
+                    finally:
+                        main_driver.release()
+                with self.session_pool.session() as driver:
+                    return self.clone(driver).get_single_product_info(asin)
             except Exception as e:
-                print(e)
-                print(f"Can't get price of a product - {self.driver.current_url}")
+                log.warning("Worker failed on product %s", asin)
+                log.warning("%s", e)
                 return None
-        except Exception as e:
-            print(e)
-            print(f"Can't get price of a product - {self.driver.current_url}")
-            return None
-        return price
 
-    @staticmethod
-    def get_asin(product_link):
-        return product_link[product_link.find('/dp/') + 4:product_link.find('/ref')]
+        # map() keeps results in the same order as the input ASINs
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(fetch, asins))
 
-    def shorten_url(self, asin):
-        return self.base_url + 'dp/' + asin
+    def get_products_info_split(self, asins):
+        log.info("Fetching %s products, parsing them in %s processes...", len(asins), self.parse_processes)
+        urls = [self.shorten_url(asin) for asin in asins]
+        # Like get_products_info_parallel, the main driver is one of the fetchers and the pool holds the rest
+        main_driver = threading.Lock()
 
-    def convert_price(self, price):
-        price = price.split(self.currency)[1]
-        try:
-            price = price.split("\n")[0] + "." + price.split("\n")[1]
-        except:
-            pass
-        try:
-            price = price.split(",")[0] + price.split(",")[1]
-        except:
-            pass
-        return float(price)
-    
-    def __init__(self, search_term, filters, base_url, currency):
-        self.base_url = base_url
-        self.search_term = search_term
-        options = get_web_driver_options()
-        set_ignore_certificate_error(options)
-        set_browser_as_incognito(options)
-        self.driver = get_chrome_web_driver(options)
-        self.currency = currency
-        self.price_filter = f"&low-price={filters['min']}&high-price={filters['max']}"
-        print(f"Initialized with search term: {self.search_term}, min price: {filters['min']}, max price: {filters['max']}")
+        def fetch_page(url):
+            # Covers the fetch and its retries only, the parse runs in the process pool
+            with metrics.timer('product_seconds', asin=extract_asin(url)):
+                return retry_with_backoff(lambda: self.capture_page(url, main_driver), self.retries,
+                                          breaker=self.breaker)
 
-    def run(self):
-        print("Starting Script...")
-        print(f"Looking for {self.search_term} products...")
-        links = self.get_products_links()
-        if not links:
-            print("Stopped script.")
-            return
-        print(f"Got {len(links)} links to products...")
-        print("Getting info about products...")
-        products = self.get_products_info(links)
-        print(f"Got info about {len(products)} products...")
-        self.driver.quit()
-        return products
+        pipeline = ParsePipeline(fetch_page, self.currency, self.locale, fetchers=self.workers,
+                                 processes=self.parse_processes)
+        products = [None] * len(asins)
 
-    def get_products_links(self):
-        self.driver.get(self.base_url)
-        print(f"Navigated to base URL: {self.base_url}")
-        element = WebDriverWait(self.driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, '//*[@id="twotabsearchtextbox"]'))
-        )
-        element.send_keys(self.search_term)
-        element.send_keys(Keys.ENTER)
-        print(f"Entered search term: {self.search_term}")
+        def collect(i, result):
+            # Journaled as each page is done, so an interrupted run keeps everything parsed so far
+            products[i] = self.collect_product(asins[i], urls[i], result)
 
-        # Wait for the results to load
-        WebDriverWait(self.driver, 10).until(
-            EC.presence_of_element_located((By.CLASS_NAME, 's-main-slot'))
-        )
-        print("Waited for search results to load")
-
-        # Get the current URL with the price filter
-        url_with_filter = f"{self.driver.current_url}{self.price_filter}"
-        self.driver.get(url_with_filter)
-        print(f"Navigated to URL with price filter: {url_with_filter}")
+        pipeline.run([self.get_product_url(url) for url in urls], on_result=collect)
+        return products
 
-        # Find the product links
-        result_list = self.driver.find_elements(By.CLASS_NAME, 's-main-slot')
-     
-        links = []
+    def collect_product(self, asin, product_short_url, result):
         try:
-            results = result_list[0].find_elements(By.CSS_SELECTOR, "div.a-section h2 a")
-            links = [link.get_attribute('href') for link in results]
-            print(f"Found {len(links)} product links")
-            return links
-        except Exception as e:
-            print("Didn't get any products...")
-            print(e)
-            return links
-
-    def get_products_info(self, links):
-        asins = self.get_asins(links)
-        products = []
-        for asin in asins:
-            product = self.get_single_product_info(asin)
-            if product:
-                products.append(product)
-        return products
+            if isinstance(result, FetchError):
+                raise result
+            product = self.product_from_fields(asin, product_short_url, result)
+        except FetchError as e:
+            product = None
+            metrics.inc('product_errors_total', error=e.kind)
+            log.warning("Error accessing product URL: %s", product_short_url)
+            log.warning("%s: %s", e.kind, e)
+            if self.dead_letters is not None:
+                self.dead_letters.add(asin, e)
+        else:
+            if self.dead_letters is not None:
+                self.dead_letters.remove(asin)
+        metrics.inc('products_total', result='ok' if product else 'failed')
+        if self.journal:
+            self.journal.record(asin, product)
+        return product
+
+    def capture_page(self, url, main_driver=None):
+        # Fetch stage of the split pipeline: the page HTML only, from the main driver when it is free and
+        # otherwise from a session borrowed from the pool
+        if self.http_backend or self.session_pool is None:
+            page = self.get_page_source(url, product=True)
+        elif main_driver is not None and main_driver.acquire(blocking=False):
+            try:
+                page = self.get_page_source(url, product=True)
+            finally:
+                main_driver.release()
+        else:
+            with self.session_pool.session() as driver:
+                page = self.clone(driver).get_page_source(url, product=True)
+        if is_captcha(page):
+            raise CaptchaError(f"Robot check on {url}")
+        return page
+
+    def clone(self, driver):
+        return AmazonAPI(self.search_term, self.filters, self.base_url, self.currency,
+                         driver=driver, backend=self.backend, http_backend=self.http_backend, cache=self.cache,
+                         session_pool=self.session_pool, fast_scrape=self.fast_scrape,
+                         retries=self.retries, breaker=self.breaker, dead_letters=self.dead_letters,
+                         journal=self.journal, asin_index=self.asin_index, page_store=self.page_store,
+                         language=self.language, locale=self.locale)
 
     def get_asins(self, links):
-        return [self.get_asin(link) for link in links]
+        # Unique, valid ASINs in link order; broken links are dropped before any page load
+        asins = [asin for asin in dict.fromkeys(self.get_asin(link) for link in links) if asin]
+        if len(asins) < len(links):
+            log.info("Kept %s unique products out of %s links", len(asins), len(links))
+        if self.asin_index is not None:
+            self.asin_index.add(asins, self.base_url, self.search_term)
+        return asins
 
     def get_single_product_info(self, asin):
-        print(f"Product ID: {asin} - getting data...")
+        with metrics.timer('product_seconds', asin=asin):
+            product = self.fetch_single_product_info(asin)
+        metrics.inc('products_total', result='ok' if product else 'failed')
+        if self.journal:
+            self.journal.record(asin, product)
+        return product
+
+    def fetch_single_product_info(self, asin):
+        log.info("Product ID: %s - getting data...", asin)
         product_short_url = self.shorten_url(asin)
-        print(f"Product URL: {product_short_url}")
+        log.info("Product URL: %s", product_short_url)
         try:
-            self.driver.get(f'{product_short_url}?language=en_GB')
-            print(f"Navigated to product URL: {product_short_url}")
-            title = self.get_title()
-            seller = self.get_seller()
-            price = self.get_price()
-            if title and seller and price:
-                product_info = {
-                    'asin': asin,
-                    'url': product_short_url,
-                    'title': title,
-                    'seller': seller,
-                    'price': price
-                }
-                print(f"Got product info: {product_info}")
-                return product_info
-        except Exception as e:
-            print(f"Error accessing product URL: {product_short_url}")
-            print(e)
-        return None
-
-    def get_title(self):
-        try:
-            title = self.driver.find_element(By.ID, 'productTitle').text
-            print(f"Got product title: {title}")
-            return title
-        except Exception as e:
-            print(e)
-            print(f"Can't get title of a product - {self.driver.current_url}")
+            product_info = retry_with_backoff(lambda: self.load_product(asin, product_short_url),
+                                              self.retries, breaker=self.breaker)
+        except FetchError as e:
+            metrics.inc('product_errors_total', error=e.kind)
+            log.warning("Error accessing product URL: %s", product_short_url)
+            log.warning("%s: %s", e.kind, e)
+            if self.dead_letters is not None:
+                self.dead_letters.add(asin, e)
             return None
+        if self.dead_letters is not None:
+            self.dead_letters.remove(asin)
+        log.info("Got product info: %s", product_info)
+        return product_info
+
+    def load_product(self, asin, product_short_url):
+        fields = None
+        if self.http_backend:
+            fields = self.http_backend.get_product_fields(self.get_product_url(product_short_url), self.currency,
+                                                          self.locale)
+        if (not fields or not all(fields.values())) and self.has_browser():
+            if self.http_backend:
+                log.warning("Falling back to browser for product: %s", asin)
+            static = self.cache.get_static(asin, self.base_url) if self.cache else None
+            fields = self.get_product_fields_in_browser(product_short_url, static)
+        return self.product_from_fields(asin, product_short_url, fields)
+
+    def get_product_fields_in_browser(self, product_short_url, static=None):
+        # HTTP fetch threads share this instance: the main browser takes one fallback at a time, the others
+        # borrow pooled sessions. With Selenium the caller already owns self.driver.
+        if self.http_backend is None or self.session_pool is None:
+            return self.get_product_fields_from_driver(product_short_url, static)
+        if self.fallback_lock.acquire(blocking=False):
+            try:
+                return self.get_product_fields_from_driver(product_short_url, static)
+            finally:
+                self.fallback_lock.release()
+        with self.session_pool.session() as driver:
+            return self.clone(driver).get_product_fields_from_driver(product_short_url, static)
+
+    def product_from_fields(self, asin, product_short_url, fields):
+        if fields.pop('captcha', False):
+            raise CaptchaError(f"Robot check on {product_short_url}")
+        missing = [field for field, value in fields.items() if not value]
+        for field in missing:
+            metrics.inc('missing_field_total', field=field)
+        if missing:
+            raise MissingElementError(f"Missing {', '.join(missing)} on {product_short_url}")
+        return {
+            'asin': asin,
+            'url': product_short_url,
+            'title': fields['title'],
+            'seller': fields['seller'],
+            'price': fields['price']
+        }
 
-    def get_seller(self):
+    def retry_dead_letters(self):
+        # Re-fetch only the ASINs that failed in earlier runs
+        if self.dead_letters is None:
+            return []
+        asins = self.dead_letters.get_asins()
+        log.info("Re-fetching %s failed products...", len(asins))
+        return [product for product in self.fetch_products(asins) if product]
+
+    def get_product_fields_from_driver(self, product_short_url, static=None):
+        with metrics.timer('page_load_seconds', backend='selenium'):
+            self.driver.get(self.get_product_url(product_short_url))
+        log.info("Navigated to product URL: %s", product_short_url)
+        if self.fast_scrape:
+            with metrics.timer('stage_seconds', stage='wait_for_nodes'):
+                self.wait_for_product_nodes()
+        if self.page_store is not None:
+            self.page_store.put(self.get_product_url(product_short_url), self.driver.page_source)
+        with metrics.timer('stage_seconds', stage='extract'):
+            fields = self.extract_product_fields()
+        if static:
+            # Title and seller are still fresh in the cache, only the price needs reading
+            fields['title'] = static['title']
+            fields['seller'] = static['seller']
+        return fields
+
+    def extract_product_fields(self):
+        raw = self.driver.execute_script(EXTRACT_PRODUCT_SCRIPT)
+        if not raw['title']:
+            log.warning("Can't get title of a product - %s", self.driver.current_url)
+        if not raw['seller']:
+            log.warning("Can't get seller of a product - %s", self.driver.current_url)
+        return {
+            'title': raw['title'],
+            'seller': raw['seller'],
+            'price': self.price_from_fields(raw),
+            'captcha': raw['captcha']
+        }
+
+    def price_from_fields(self, raw):
+        # priceblock first, then the current '.a-price' layout, then the offer price of available items
         try:
-            seller = self.driver.find_element(By.ID, 'bylineInfo').text
-            print(f"Got product seller: {seller}")
-            return seller
-        except Exception as e:
-            print(e)
-            print(f"Can't get seller of a product - {self.driver.current_url}")
-            return None
+            if raw['price_block']:
+                return self.convert_price(raw['price_block'])
+            if raw['price_whole']:
+                return join_price_parts(raw['price_whole'], raw['price_fraction'])
+            if raw['availability'] and 'Available' in raw['availability'] and raw['offer_price']:
+                price = raw['offer_price']
+                return self.convert_price(price[price.find(self.currency):])
+        except ValueError as e:
+            raise ParseError(f"Can't parse price of a product - {self.driver.current_url}: {e}")
+        log.warning("Can't get price of a product - %s", self.driver.current_url)
+        return None
 
-    def get_price(self):
-        price = None
+    def wait_for_product_nodes(self):
+        # With eager loading the page may still be settling; wait only for the nodes we read
         try:
-            price = self.driver.find_element(By.ID, 'priceblock_ourprice').text
-            price = self.convert_price(price)
-            print(f"Got product price: {price}")
-        except NoSuchElementException:
-            try:
-                availability = self.driver.find_element(By.ID, 'availability').text
-                if 'Available' in availability:
-                    price = self.driver.find_element(By.CLASS_NAME, 'olp-padding-right').text
-                    price = price[price.find(self.currency):]
-                    price = self.convert_price(price)
-                    print(f"Got product price: {price}")
-            except Exception as e:
-                print(e)
-                print(f"Can't get price of a product - {self.driver.current_url}")
-                return None
-        except Exception as e:
-            print(e)
-            print(f"Can't get price of a product - {self.driver.current_url}")
-            return None
-        return price
+            WebDriverWait(self.driver, PAGE_WAIT).until(
+                lambda driver: driver.find_elements(By.ID, 'productTitle') and
+                driver.find_elements(By.ID, 'bylineInfo') and
+                driver.find_elements(By.CSS_SELECTOR, '#priceblock_ourprice, .a-price')
+            )
+        except TimeoutException:
+            log.warning("Product nodes not all present - %s", self.driver.current_url)
 
     @staticmethod
     def get_asin(product_link):
-        return product_link[product_link.find('/dp/') + 4:product_link.find('/ref')]
+        return extract_asin(product_link)
 
     def shorten_url(self, asin):
-        return self.base_url + 'dp/' + asin
+        return get_canonical_url(self.base_url, asin)
+
+    def get_product_url(self, product_short_url):
+        return f'{product_short_url}?language={self.language}'
 
     def convert_price(self, price):
-        price = price.split(self.currency)[1]
-        try:
-            price = price.split("\n")[0] + "." + price.split("\n")[1]
-        except:
-            pass
-        try:
-            price = price.split(",")[0] + price.split(",")[1]
-        except:
-            pass
-        return float(price)
+        return convert_price(price, self.currency, self.locale)
 
 
 if __name__ == '__main__':
-    am = AmazonAPI(NAME, FILTERS, BASE_URL, CURRENCY)
-    data = am.run()
-    GenerateReport(NAME, FILTERS, BASE_URL, CURRENCY, data)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Track Amazon prices for the search term in amazon_config')
+    parser.add_argument('--resume', action='store_true', help='skip products finished by an interrupted run')
+    parser.add_argument('--record', action='store_true', help=f'store every fetched page in {PAGE_STORE_DIR}')
+    parser.add_argument('--replay', action='store_true', help='re-run on the recorded pages, without any network')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help=f'only re-fetch the products listed in {DEAD_LETTER_FILE}')
+    parser.add_argument('--refresh-stale', action='store_true',
+                        help='only re-fetch cached products whose price or details have expired')
+    args = parser.parse_args()
+    configure_logging()
+    if args.replay:
+        # Replayed prices are old, so they stay out of the cache, history, alerts and live reports
+        os.makedirs(REPLAY_DIR, exist_ok=True)
+        page_store = PageStore()
+        am = AmazonAPI(NAME, FILTERS, BASE_URL, CURRENCY, workers=WORKERS, backend='replay',
+                       max_pages=MAX_PAGES, max_items=MAX_ITEMS, page_store=page_store, locale=LOCALE,
+                       parse_processes=PARSE_PROCESSES)
+        GenerateReport(NAME, FILTERS, BASE_URL, CURRENCY, am.run(), directory=REPLAY_DIR)
+        page_store.close()
+        sys.exit()
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+    page_store = PageStore() if args.record else None
+    cache = ProductCache()
+    dead_letters = DeadLetterList()
+    # Partial runs re-fetch a few known products: they update the history and alerts but not the report
+    partial = args.retry_failed or args.refresh_stale
+    journal = None if partial else CheckpointJournal(NAME, resume=args.resume)
+    asin_index = AsinIndex()
+    am = AmazonAPI(NAME, FILTERS, BASE_URL, CURRENCY, workers=WORKERS, backend=BACKEND, cache=cache,
+                   max_pages=MAX_PAGES, max_items=MAX_ITEMS, fast_scrape=FAST_SCRAPE, retries=RETRIES,
+                   breaker=CircuitBreaker(), dead_letters=dead_letters, journal=journal,
+                   asin_index=asin_index, page_store=page_store, locale=LOCALE, parse_processes=PARSE_PROCESSES)
+    if partial:
+        data = am.retry_dead_letters() if args.retry_failed else am.refresh_stale()
+        am.quit()
+    else:
+        data = am.run()
+    cache.save()
+    dead_letters.save()
+    log.info("Cache stats: %s", cache.get_stats())
+    history = PriceHistory()
+    detector = ChangeDetector(NAME) if DIFF_MODE and not partial else None
+    alerts = AlertEngine(history=history)
+    if partial:
+        alerts.check(data, NAME, BASE_URL)
+        log.info("Saved %s price observations to history", history.add_products(data, NAME, CURRENCY,
+                                                                                 base_url=BASE_URL))
+    else:
+        GenerateReport(NAME, FILTERS, BASE_URL, CURRENCY, data, history=history, detector=detector, alerts=alerts,
+                       failed=dead_letters.get_asins())
+    history.close()
+    asin_index.close()
+    if journal:
+        journal.clear()
+    if page_store is not None:
+        page_store.close()
+    if METRICS_FILE:
+        metrics.write_snapshot(METRICS_FILE)
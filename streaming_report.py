@@ -0,0 +1,67 @@
+import gzip
+import json
+from datetime import datetime
+from amazon_config import DIRECTORY
+
+
+class StreamingReport:
+    # Writes products to disk as they arrive and keeps only running stats in memory.
+    # 'json' produces the same document shape as GenerateReport, 'ndjson' one product per line
+    # between a header line and a summary line.
+    def __init__(self, file_name, filters, base_link, currency, directory=DIRECTORY, output_format='json',
+                 compress=False):
+        self.output_format = output_format
+        extension = 'json' if output_format == 'json' else 'ndjson'
+        self.path = f'{directory}/{file_name}.{extension}' + ('.gz' if compress else '')
+        self.file = gzip.open(self.path, 'wt', encoding='utf-8') if compress else \
+            open(self.path, 'w', encoding='utf-8')
+        self.count = 0
+        self.total = 0.0
+        self.min_price = None
+        self.max_price = None
+        self.best_item = None
+        header = {
+            'title': file_name,
+            'date': datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+            'currency': currency,
+            'filters': filters,
+            'base_link': base_link
+        }
+        if output_format == 'json':
+            self.file.write(json.dumps(header)[:-1] + ', "products": [')
+        else:
+            self.file.write(json.dumps(header) + '\n')
+
+    def write(self, product):
+        price = product['price']
+        if self.best_item is None or price < self.min_price:
+            self.best_item = product
+            self.min_price = price
+        self.max_price = price if self.max_price is None else max(self.max_price, price)
+        self.total += price
+        if self.output_format == 'json':
+            self.file.write((', ' if self.count else '') + json.dumps(product))
+        else:
+            self.file.write(json.dumps(product) + '\n')
+        self.count += 1
+
+    def get_summary(self):
+        return {
+            'count': self.count,
+            'min_price': self.min_price,
+            'max_price': self.max_price,
+            'mean_price': self.total / self.count if self.count else None
+        }
+
+    def close(self):
+        if self.output_format == 'json':
+            self.file.write(f'], "best_item": {json.dumps(self.best_item)}, "summary": {json.dumps(self.get_summary())}}}')
+        else:
+            self.file.write(json.dumps({'best_item': self.best_item, 'summary': self.get_summary()}) + '\n')
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,52 @@
+import pytest
+from price_parser import parse_price, parse_price_range, parse_prices
+
+
+@pytest.mark.parametrize('raw, currency, expected', [
+    ('₹1,29,999.00', '₹', 129999.0),
+    ('₹24,990', '₹', 24990.0),
+    ('1.299,00 €', '€', 1299.0),
+    ('1.299 €', '€', 1299.0),
+    ('19.99 €', '€', 19.99),
+    ('EUR 1.5', '€', 1.5),
+    ('€1,299.00', '€', 1299.0),
+    ('12,5', None, 12.5),
+    ('1,299', None, 1299.0),
+    ('₹24,990\n00', '₹', 24990.0),
+    ('2 for ₹1,299', '₹', 1299.0),
+    ('Pack of 2 - ₹499', '₹', 499.0),
+    ('1.299,00 €', 'EUR', 1299.0),
+])
+def test_parse_price(raw, currency, expected):
+    assert parse_price(raw, currency=currency) == expected
+
+
+def test_parse_price_with_locale():
+    assert parse_price('1 299,00 €', locale='fr_FR') == 1299.0
+    assert parse_price('1.299,99', locale='de_DE') == 1299.99
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('$10 - $15', (10.0, 15.0)),
+    ('10–15 €', (10.0, 15.0)),
+    ('₹1,299.00 (₹129.90 / 100 g)', (1299.0, 1299.0)),
+    ('₹ 24,990.00 + ₹ 40.00 Delivery charge', (24990.0, 24990.0)),
+])
+def test_parse_price_range(raw, expected):
+    assert parse_price_range(raw) == expected
+
+
+def test_currency_range():
+    assert parse_price_range('10–15 €', currency='€') == (10.0, 15.0)
+
+
+def test_unparsable_prices():
+    assert parse_price_range(None) == (None, None)
+    assert parse_price('Currently unavailable') is None
+    # Without its symbol or code there is no price in the given currency
+    assert parse_price('Save 10%', currency='₹') is None
+    assert parse_price('24,990', currency='₹') is None
+
+
+def test_parse_prices_keeps_order():
+    assert parse_prices(['₹100', '₹2,000', '₹100'], currency='₹') == [100.0, 2000.0, 100.0]
@@ -0,0 +1,75 @@
+import threading
+import pytest
+from session_pool import SessionPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.closed = False
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        self.closed = True
+
+
+@pytest.fixture
+def drivers():
+    return []
+
+
+@pytest.fixture
+def create_driver(drivers):
+    def create():
+        drivers.append(FakeDriver())
+        return drivers[-1]
+    return create
+
+
+def test_acquire_reuses_idle_sessions(create_driver, drivers):
+    pool = SessionPool(2, create_driver, max_page_loads=0, max_memory_mb=0)
+    session = pool.acquire()
+    pool.release(session)
+    assert pool.acquire() is session
+    assert len(drivers) == 1
+
+
+def test_warm_up_starts_every_session(create_driver, drivers):
+    pool = SessionPool(3, create_driver, max_page_loads=0, max_memory_mb=0)
+    pool.warm_up()
+    assert len(drivers) == 3 and len(pool.idle) == 3
+    pool.close()
+    assert pool.open_sessions == 0 and all(driver.closed for driver in drivers)
+
+
+def test_broken_release_wakes_a_waiter(create_driver, drivers):
+    pool = SessionPool(1, create_driver, max_page_loads=0, max_memory_mb=0)
+    session = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    waiter.join(0.1)
+    assert not acquired
+    pool.release(session, broken=True)
+    waiter.join(2)
+    assert acquired and acquired[0] is not session
+    assert drivers[0].closed and pool.open_sessions == 1
+
+
+def test_worn_out_sessions_are_recycled(create_driver, drivers):
+    pool = SessionPool(1, create_driver, max_page_loads=2, max_memory_mb=0)
+    with pool.session() as session:
+        session.get('a')
+        session.get('b')
+    assert pool.recycled == 1 and drivers[0].closed
+    with pool.session() as session:
+        assert session.driver is drivers[1]
+
+
+def test_session_that_raises_is_discarded(create_driver, drivers):
+    pool = SessionPool(1, create_driver, max_page_loads=0, max_memory_mb=0)
+    with pytest.raises(RuntimeError):
+        with pool.session():
+            raise RuntimeError('crashed')
+    assert pool.open_sessions == 0 and drivers[0].closed
@@ -0,0 +1,201 @@
+import sys
+import time
+import logging
+import heapq
+import itertools
+from collections import deque
+from statistics import mean, pstdev
+from simple_tracker import AmazonAPI
+from batch_tracker import load_watchlist
+from price_history import PriceHistory
+from metrics import metrics, configure_logging
+from resilience import CircuitBreaker
+from alerts import AlertEngine
+from amazon_config import (
+    WORKERS,
+    BACKEND,
+    FAST_SCRAPE,
+    RETRIES,
+    WATCHLIST,
+    METRICS_FILE,
+    METRICS_PORT,
+    MIN_POLL_INTERVAL,
+    MAX_POLL_INTERVAL,
+    SEARCH_INTERVAL,
+    NEAR_TARGET
+)
+
+log = logging.getLogger(__name__)
+
+RECENT_PRICES = 10
+
+
+def get_poll_interval(prices, target=None, min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL):
+    # Volatile prices and prices close to the target are polled often, stable ones rarely
+    if not prices:
+        return min_interval
+    if target and prices[-1] <= float(target) * (1 + NEAR_TARGET):
+        return min_interval
+    volatility = pstdev(prices) / mean(prices) if len(prices) > 1 and mean(prices) else 0.0
+    interval = max_interval / (1 + 100 * volatility)
+    return max(min_interval, min(max_interval, interval))
+
+
+class PollScheduler:
+    # Min-heap of (due_at, sequence, key); rescheduling pushes a new entry and the stale one
+    # is skipped when popped, so each tick costs O(k log n) for the k due items.
+    def __init__(self):
+        self.heap = []
+        self.due = {}
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.due)
+
+    def schedule(self, key, due_at):
+        self.due[key] = due_at
+        heapq.heappush(self.heap, (due_at, next(self.counter), key))
+
+    def remove(self, key):
+        self.due.pop(key, None)
+
+    def pop_due(self, now, limit):
+        keys = []
+        while self.heap and self.heap[0][0] <= now and len(keys) < limit:
+            due_at, _, key = heapq.heappop(self.heap)
+            if self.due.get(key) == due_at:
+                del self.due[key]
+                keys.append(key)
+        return keys
+
+    def next_due(self):
+        while self.heap and self.due.get(self.heap[0][2]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+
+class TrackerDaemon:
+    # Long-running tracker that keeps its browser/HTTP sessions warm between polls
+    def __init__(self, watchlist, history, workers=WORKERS, backend=BACKEND, batch_size=20,
+                 search_interval=SEARCH_INTERVAL, alerts=None):
+        self.alerts = alerts
+        # Keyed by report name, i.e. by search term and store
+        self.watchlist = {query['report_name']: query for query in watchlist}
+        self.history = history
+        self.workers = workers
+        self.backend = backend
+        self.batch_size = batch_size
+        self.search_interval = search_interval
+        self.scheduler = PollScheduler()
+        self.searches = PollScheduler()
+        # (report name, asin) -> last few prices, seeded from the history
+        self.recent = {}
+        # report name -> ASINs its latest search returned
+        self.tracked = {}
+        self.api = None
+        # Watchlist entry the API is currently set up for
+        self.current = None
+
+    def start(self):
+        if not self.watchlist:
+            log.warning("Watchlist is empty.")
+            return False
+        self.current, first = next(iter(self.watchlist.items()))
+        self.api = AmazonAPI(first['name'], first['filters'], first['base_url'], first['currency'],
+                             workers=self.workers, backend=self.backend, fast_scrape=FAST_SCRAPE,
+                             retries=RETRIES, breaker=CircuitBreaker(), language=first['language'],
+                             locale=first['locale'])
+        now = time.time()
+        for name in self.watchlist:
+            self.searches.schedule(name, now)
+        return True
+
+    def use_query(self, name):
+        query = self.watchlist[name]
+        if self.current != name:
+            self.current = name
+            self.api.set_query(query['name'], query['filters'], currency=query['currency'],
+                               base_url=query['base_url'], language=query['language'], locale=query['locale'])
+        return query
+
+    def discover(self, name):
+        self.use_query(name)
+        try:
+            links = self.api.get_products_links()
+        except Exception as e:
+            log.warning("Search failed for %s: %s", name, e)
+            links = []
+        now = time.time()
+        asins = self.api.get_asins(links)
+        for asin in asins:
+            key = (name, asin)
+            if key not in self.recent:
+                series = self.history.get_price_series(asin, base_url=self.api.base_url)
+                prices = [price for _, price in series[-RECENT_PRICES:]]
+                self.recent[key] = deque(prices, maxlen=RECENT_PRICES)
+                self.scheduler.schedule(key, now)
+        # Products that left the results stop being polled; a failed or empty search keeps the previous ones
+        if asins:
+            dropped = self.tracked.get(name, set()) - set(asins)
+            for asin in dropped:
+                self.scheduler.remove((name, asin))
+                del self.recent[(name, asin)]
+            if dropped:
+                log.info("Stopped tracking %s products no longer found for %s", len(dropped), name)
+            self.tracked[name] = set(asins)
+        self.searches.schedule(name, now + self.search_interval)
+        log.info("Tracking %s products", len(self.scheduler))
+
+    def poll(self, keys):
+        by_query = {}
+        for name, asin in keys:
+            by_query.setdefault(name, []).append(asin)
+        for name, asins in by_query.items():
+            query = self.use_query(name)
+            products = self.api.fetch_products(asins)
+            if self.alerts:
+                self.alerts.check([product for product in products if product], query['name'], query['base_url'])
+            self.history.add_products([product for product in products if product], query['name'],
+                                      query['currency'], base_url=query['base_url'])
+            now = time.time()
+            for asin, product in zip(asins, products):
+                recent = self.recent[(name, asin)]
+                if product:
+                    recent.append(product['price'])
+                interval = get_poll_interval(list(recent), query.get('target'))
+                self.scheduler.schedule((name, asin), now + interval)
+
+    def tick(self):
+        now = time.time()
+        for name in self.searches.pop_due(now, len(self.watchlist)):
+            self.discover(name)
+        due = self.scheduler.pop_due(now, self.batch_size)
+        if due:
+            self.poll(due)
+        return due
+
+    def run_forever(self, idle_sleep=1.0):
+        if not self.start():
+            return
+        try:
+            while True:
+                if not self.tick():
+                    next_due = min(filter(None, (self.scheduler.next_due(), self.searches.next_due())),
+                                   default=time.time() + idle_sleep)
+                    time.sleep(max(0.0, min(idle_sleep * 60, next_due - time.time())))
+        except KeyboardInterrupt:
+            log.info("Stopping tracker...")
+        finally:
+            self.api.quit()
+
+
+if __name__ == '__main__':
+    configure_logging()
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+    history = PriceHistory()
+    TrackerDaemon(load_watchlist(sys.argv[1] if len(sys.argv) > 1 else WATCHLIST), history,
+                  alerts=AlertEngine(history=history)).run_forever()
+    history.close()
+    if METRICS_FILE:
+        metrics.write_snapshot(METRICS_FILE)